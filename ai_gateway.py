@@ -0,0 +1,140 @@
+import threading # Limits and breaker state are shared by every request thread in the worker
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+import httpx
+import openai
+from flask import current_app # For config and the per-app gateway
+from instrumentation import timed, ai_queue_wait
+
+# Per-operation deadline in seconds. Each operation is a single attempt, so the deadline bounds how long it
+# holds a worker slot: SDK retries would each get a fresh timeout plus backoff on top. Upstream failures
+# go back to the caller and count against the breaker instead.
+OPERATIONS = {
+    'generate': {'timeout': 60.0, 'max_retries': 0}, # dall-e-3 usually answers in 10-20s
+    'edit': {'timeout': 90.0, 'max_retries': 0} # Uploads a 4MB PNG before the model runs
+}
+CONNECT_TIMEOUT = 5.0
+
+# Upstream failures that count against the breaker; 4xx like a rejected prompt are the caller's problem
+UPSTREAM_ERRORS = (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError) # APITimeoutError is an APIConnectionError
+
+# Raised instead of calling OpenAI, status_code is what the route should answer with
+class AIUnavailable(Exception):
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+# Fails fast once `threshold` calls in a row failed upstream. After `cooldown` seconds a single trial
+# call is let through: success closes the breaker, failure opens it for another cooldown.
+class CircuitBreaker:
+    def __init__(self, threshold, cooldown):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._trial_running or time.monotonic() - self._opened_at < self.cooldown:
+                return False
+            self._trial_running = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+    # A call that ended without an upstream verdict (e.g. a rejected prompt) frees the trial slot
+    def record_neutral(self):
+        with self._lock:
+            self._trial_running = False
+
+# Shared OpenAI client behind concurrency limits and a circuit breaker
+class AIGateway:
+    def __init__(self, api_key, max_concurrency, max_per_user, queue_timeout, breaker):
+        # One pooled client per worker; keep-alive connections skip the TLS handshake on every call
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency, keepalive_expiry=30.0),
+            timeout=httpx.Timeout(60.0, connect=CONNECT_TIMEOUT)
+        )
+        self.client = openai.OpenAI(api_key=api_key, http_client=self.http_client, max_retries=0)
+        self.max_per_user = max_per_user
+        self.queue_timeout = queue_timeout
+        self.breaker = breaker
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._per_user = defaultdict(int)
+
+    def _take_user_slot(self, user_id):
+        with self._lock:
+            if self._per_user[user_id] >= self.max_per_user:
+                return False
+            self._per_user[user_id] += 1
+            return True
+
+    def _free_user_slot(self, user_id):
+        with self._lock:
+            self._per_user[user_id] -= 1
+            if not self._per_user[user_id]:
+                del self._per_user[user_id]
+
+    # Yields the client configured for `operation` once the user and the worker have a free slot.
+    #   with gateway.call('generate', user_id) as client:
+    #       response = client.images.generate(...)
+    @contextmanager
+    def call(self, operation, user_id):
+        if not self._take_user_slot(user_id):
+            raise AIUnavailable("Too many image requests in progress, try again shortly", 429)
+        try:
+            if not self.breaker.allow():
+                raise AIUnavailable("Image service is temporarily unavailable", 503)
+            started = time.perf_counter()
+            with timed('ai_queue'):
+                acquired = self._slots.acquire(timeout=self.queue_timeout)
+            ai_queue_wait.observe((operation, 'acquired' if acquired else 'timeout'), time.perf_counter() - started)
+            if not acquired:
+                self.breaker.record_neutral()
+                raise AIUnavailable("Image service is busy, try again shortly", 503)
+            try:
+                with timed('openai'):
+                    yield self.client.with_options(**OPERATIONS[operation])
+            except UPSTREAM_ERRORS:
+                self.breaker.record_failure()
+                raise
+            except BaseException:
+                self.breaker.record_neutral()
+                raise
+            else:
+                self.breaker.record_success()
+            finally:
+                self._slots.release()
+        finally:
+            self._free_user_slot(user_id)
+
+def init_ai_gateway(app):
+    gateway = AIGateway(
+        app.config['SECRET_KEY'],
+        app.config['AI_MAX_CONCURRENCY'],
+        app.config['AI_MAX_PER_USER'],
+        app.config['AI_QUEUE_TIMEOUT'],
+        CircuitBreaker(app.config['AI_BREAKER_THRESHOLD'], app.config['AI_BREAKER_COOLDOWN'])
+    )
+    app.extensions['ai_gateway'] = gateway
+    return gateway
+
+def get_ai_gateway():
+    return current_app.extensions['ai_gateway']
@@ -1,45 +1,74 @@
 # Server side session with added import stored
 # Server side session with added import stored
 # Server side session with added import stored
-from flask import Flask, request, jsonify, session, abort, send_from_directory, url_for # core flask imports
+from flask import Flask, Response, request, jsonify, session, abort, url_for # core flask imports
 from flask_bcrypt import Bcrypt # For Password Hashing
 from flask_session import Session # For server-side Session Management
-from models import User, Post, Comment, Like, Poll, PollOption, PollVote # Import the user and post model
+from models import User, Post, Comment, Poll, PollOption, PollVote, Follow, saved_posts_table # Import the user and post model
+from pagination import encode_cursor, decode_cursor, encode_score_cursor, decode_score_cursor, normalize_sqlite_timestamps # Keyset cursors for paginated feeds
+from category_pools import get_category_id, add_post_to_pool, sample_pool, rebuild_pools, backfill_category_ids # Materialized explore pools
+from counters import reconcile_counters # Periodic counter cache repair
+from ranking import initial_hot_score, refresh_hot_scores # Hot scores for ranked explore
+from instrumentation import init_instrumentation # Server-Timing headers and /metrics
+from session_cache import init_session_cache # In-process cache in front of Redis sessions
+from projections import load_user_profile, load_credentials, user_exists # Narrow read-only user queries
+from user_cards import get_user_cards, get_user_card, invalidate_user_card # Cached author usernames for serializers
+from tokens import init_token_auth, issue_token_pair, verify_token, revoke, TokenSession # Optional stateless bearer tokens
+from timeline import fan_out_post, on_follow, on_unfollow, read_timeline, read_timeline_from_database # Precomputed home timelines
+from polls import MAX_POLL_BATCH_SIZE, validate_poll, create_polls # Single-statement poll inserts
+from realtime import get_broker, publish_poll_vote, stream_poll_updates, publish_comment, subscribe_comments, stream_comment_updates, MAX_PENDING_COMMENTS # Pub/sub fan-out for live updates
+from reactions import REACTIONS, MAX_BATCH_SIZE, set_reaction, coalesce_operations, apply_reactions, mark_applied, reaction_state, add_like_unique_key # Idempotent batched reactions
+from direct_uploads import UploadError, validate_upload_request, start_upload, claim_upload, release_upload, verify_upload # Signed direct-to-GCS uploads
+from upload_streams import StreamingUploadRequest # Streaming multipart ingestion
+from media import store_media, reference_media, release_media, collect_media_garbage # Content-addressed media dedup
+from perceptual import hash_upload, index_post, find_near_duplicates, to_unsigned, dedupe_near_duplicates, rebuild_index # Perceptual-hash near-duplicates
+from media_serving import send_media # Range/ETag media serving with optional proxy offload
+from storage import init_storage, get_storage, GCSStorage, LocalStorage # Pluggable media storage backends
+from ai_gateway import AIUnavailable, init_ai_gateway, get_ai_gateway # Shared OpenAI client with limits and timeouts
+from generated_media import init_generated_media, persist_generated_image # DALL-E images kept in our storage
+from captions import MAX_CAPTION_LENGTH, CaptionBusy, init_captions, caption_upload # Server-side caption rendering
 from flask_migrate import Migrate
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import selectinload
+from redis.exceptions import RedisError
+from sqlalchemy.exc import IntegrityError
 from google.cloud import storage
+from google.auth.credentials import AnonymousCredentials # For the local GCS emulator
 from config import ApplicationConfig # Import App config
 from database import db # Import the database instance
-from sqlalchemy import desc
-from werkzeug.utils import secure_filename 
+from sqlalchemy import desc, and_, or_
+from werkzeug.exceptions import HTTPException, RequestEntityTooLarge
 # from authlib.integrations.flask_client import OAuth
 from flask_cors import CORS 
-from openai import OpenAI, Image
 from pathlib import Path
-from PIL import Image as PILImage, ImageDraw, ImageFont
+from PIL import Image as PILImage, UnidentifiedImageError
 import io
 import random
 import smtplib
 import os
-import uuid
-import base64
 from sqlalchemy.sql import func 
 # Create flask application instance 
 app = Flask(__name__)
 app.config.from_object(ApplicationConfig) # Load config from App Config
+app.request_class = StreamingUploadRequest # Spill, hash and size-cap file parts while they stream in
 
 FONT_SIZE = 36
 
 bcrypt = Bcrypt(app) # Initialize Bcrypt for password hashing
 server_session = Session(app) # Initialize server-side session management 
+init_session_cache(app) # Cache verified sessions per worker
+init_token_auth(app) # Bearer tokens bypass the session store when TOKEN_AUTH_ENABLED
+init_instrumentation(app) # Per-request timing breakdown, after Session so its interface is wrapped
 db.init_app(app) # Initialize database with the Flask App
 migrate = Migrate(app, db)
 CORS(app, origins= '*')
-client = OpenAI(api_key=app.config['SECRET_KEY'])
+init_ai_gateway(app) # Pooled OpenAI client behind concurrency limits and a circuit breaker
 
 
 # GOOGLE API INTEGRATION
 def get_gcs_client():
+    if os.getenv('STORAGE_EMULATOR_HOST'):
+        # Local GCS emulator (e.g. fake-gcs-server) takes no credentials
+        return storage.Client(project='campuscircle-local', credentials=AnonymousCredentials())
     return storage.Client()
 
 # oauth = OAuth(app)
@@ -88,25 +117,31 @@ with app.app_context():
     db.create_all()
 
 # For profile pic on register
-ALLOWED_EXTENSIONS = {"png", "jpg","jpeg", "mp4", "mov"}
+ALLOWED_EXTENSIONS = {"png", "jpg","jpeg", "webp", "mp4", "mov"}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-# Upload Google Cloud
-def upload_to_gcs(file, bucket_name, filename):
-    "Uploads a file to google cloud storage and returns the public URL"
+init_storage(app, get_gcs_client) # GCS or local disk, by STORAGE_BACKEND
+init_generated_media(app)
+init_captions(app)
 
+# Content-addressed upload: bytes already stored under the same SHA-256 are referenced instead of sent again.
+# Returns (url, sha256), or (None, None) if the upload failed. The reference commits with the caller.
+def store_upload(file):
+    sha256 = file.stream.sha256 # Computed while the part streamed in
     try:
-        client = storage.Client()
-        bucket = client.get_bucket(bucket_name)
-        blob = bucket.blob(filename)
-        blob.upload_from_file(file, content_type=file.content_type)
-        # blob.make_public() 
-        return f"https://storage.googleapis.com/{bucket_name}/{filename}"
+        # Streams from the spooled part without reading it into memory
+        file_url = store_media(get_storage(), file, sha256, file.filename.rsplit('.', 1)[1].lower(), file.mimetype, file.stream.length)
     except Exception as e:
-        print(f"Faied to upload to GCS: {e}")
-        return None
+        print(f"Failed to upload to storage: {e}")
+        return None, None
+    return file_url, sha256
+
+# Oversized bodies and file parts get a JSON error like every other route
+@app.errorhandler(RequestEntityTooLarge)
+def request_too_large(e):
+    return jsonify({"error": e.description}), 413
 
 # The POLLS 
 # Fetch other User Polls
@@ -140,12 +175,14 @@ def get_user_polls():
 
 def fetch_polls(query, page, per_page):
     polls = query.paginate(page=page, per_page=per_page, error_out=False)
+    cards = get_user_cards(poll.user_id for poll in polls.items)
     polls_list = [
         {
             'id': poll.id,
             'user_id': poll.user_id,
-            'username': poll.user.username,
+            'username': cards[poll.user_id]['username'],
             'title': poll.title,
+            'total_votes': poll.total_votes,
             'options': get_poll_options(poll)
         } for poll in polls.items
     ]
@@ -171,33 +208,48 @@ def create_poll():
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
     
-    data = request.get_json()
-    title = data.get('title')
-    options = data.get('options')
-    
-    if not title or not options or len(options) < 2:
-        return jsonify({"error": "Invalid poll data"}), 400
-    
-    # Validate unique options
-    if len(set(options)) != len(options):
-        return jsonify({"error": "Poll options must be unique"}), 400
+    data = request.get_json(silent=True)
+    error = validate_poll(data)
+    if error:
+        return jsonify({"error": error}), 400
 
     try:
-        user = User.query.get(user_id)
-        new_poll = Poll(title=title, user=user)
-        db.session.add(new_poll)
-        db.session.flush()
+        poll_id, = create_polls(user_id, [data])
+        db.session.commit()
+        return jsonify({"message": "Poll created successfully", "poll_id": poll_id}), 201
+
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating poll: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+# Create several polls at once, e.g. an org importing a survey: {"polls": [{"title", "options"}, ...]}.
+# All or nothing, poll ids come back in request order.
+@app.route('/create_polls', methods=['POST'])
+def create_polls_batch():
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
 
-        for option_text in options:
-            new_option = PollOption(text=option_text, poll_id=new_poll.id)
-            db.session.add(new_option)
+    data = request.get_json(silent=True) or {}
+    polls = data.get('polls')
+    if not isinstance(polls, list) or not polls:
+        return jsonify({"error": "polls must be a non-empty list"}), 400
+    if len(polls) > MAX_POLL_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_POLL_BATCH_SIZE} polls per request"}), 400
+    for index, poll in enumerate(polls):
+        error = validate_poll(poll)
+        if error:
+            return jsonify({"error": f"polls[{index}]: {error}"}), 400
 
+    try:
+        poll_ids = create_polls(user_id, polls)
         db.session.commit()
-        return jsonify({"message": "Poll created successfully", "poll_id": new_poll.id}), 201
+        return jsonify({"message": "Polls created successfully", "poll_ids": poll_ids}), 201
 
     except Exception as e:
         db.session.rollback()
-        print(f"Error creating poll: {e}")
+        print(f"Error creating polls: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
 
 # Voting Route
@@ -222,19 +274,23 @@ def vote_poll(poll_id, option_id):
 
         new_vote = PollVote(user_id=user_id, poll_id=poll_id, option_id=option_id)
         db.session.add(new_vote)
-        poll_option.vote_count += 1
+        # Increment counters in SQL so concurrent votes never lose an update
+        PollOption.query.filter_by(id=option_id).update({PollOption.vote_count: PollOption.vote_count + 1}, synchronize_session=False)
+        Poll.query.filter_by(id=poll_id).update({Poll.total_votes: Poll.total_votes + 1}, synchronize_session=False)
 
         # Refresh poll and options to get the latest data
         db.session.refresh(poll)
         db.session.refresh(poll_option)
         db.session.commit()
+        publish_poll_vote(poll.id, poll_option.id, poll_option.vote_count, poll.total_votes)
 
         poll_data = {  # Ensure the returned data is consistent
             'id': poll.id,
             'title': poll.title,
+            'total_votes': poll.total_votes,
             'options': get_poll_options(poll),
             'user_id': poll.user_id,
-            'username': poll.user.username
+            'username': get_user_card(poll.user_id)['username']
         }
         return jsonify(poll_data), 200
     except Exception as e:  # Add a general exception handler
@@ -243,6 +299,71 @@ def vote_poll(poll_id, option_id):
         return jsonify({"error": "Internal server error"}), 500
 
 
+# Live poll results over Server-Sent Events, ?poll_ids=a,b,c
+@app.route('/stream_polls', methods=['GET'])
+def stream_polls():
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    poll_ids = [poll_id for poll_id in request.args.get('poll_ids', '').split(',') if poll_id][:50]
+    if not poll_ids:
+        return jsonify({"error": "Missing poll_ids"}), 400
+
+    stream = stream_poll_updates(get_broker(), poll_ids, app.config['POLL_STREAM_INTERVAL'])
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no' # Stop proxies from buffering the stream
+    })
+
+# Follow another user
+@app.route('/follow/<followed_id>', methods=['POST'])
+def follow_user(followed_id):
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+    if followed_id == user_id:
+        return jsonify({"error": "Cannot follow yourself"}), 400
+    if not db.session.query(User.id).filter_by(id=followed_id).first():
+        return jsonify({"error": "Not found"}), 404
+    if db.session.get(Follow, (user_id, followed_id)):
+        return jsonify({"message": "Already following"}), 200
+
+    try:
+        db.session.add(Follow(follower_id=user_id, followed_id=followed_id))
+        User.query.filter_by(id=followed_id).update({User.follower_count: User.follower_count + 1}, synchronize_session=False)
+        User.query.filter_by(id=user_id).update({User.following_count: User.following_count + 1}, synchronize_session=False)
+        db.session.commit()
+        on_follow(user_id, followed_id)
+        return jsonify({"message": "Followed successfully"}), 201
+    except IntegrityError:
+        db.session.rollback() # A concurrent follow inserted the row first
+        return jsonify({"message": "Already following"}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error following user: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+# Unfollow a user
+@app.route('/follow/<followed_id>', methods=['DELETE'])
+def unfollow_user(followed_id):
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    try:
+        deleted = Follow.query.filter_by(follower_id=user_id, followed_id=followed_id).delete(synchronize_session=False)
+        if deleted:
+            User.query.filter_by(id=followed_id).update({User.follower_count: User.follower_count - 1}, synchronize_session=False)
+            User.query.filter_by(id=user_id).update({User.following_count: User.following_count - 1}, synchronize_session=False)
+        db.session.commit()
+        if deleted:
+            on_unfollow(user_id, followed_id)
+        return jsonify({"message": "Unfollowed successfully"}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error unfollowing user: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
 
 # Count total number of user posts():
 @app.route('/user_total_posts', methods=['GET'])
@@ -257,72 +378,72 @@ def user_total_posts():
 # Creating the likes for posts
 @app.route('/like_post/<post_id>', methods=['POST'])
 def like_post(post_id):
-    user_id = session.get('user_id')
-    if not user_id:
-        return jsonify({"error": "Unauthorized"}), 401
-    
-    post = Post.query.get(post_id)
-    if not post:
-        return jsonify({"error": "Post not found"}), 404
-
-    # Check if the user has already liked or disliked this post
-    existing_like = Like.query.filter_by(user_id=user_id, post_id=post_id).first()
-    
-    if existing_like:
-        if existing_like.is_like:
-            return jsonify({"message": "Post already liked"}), 400
-        else:
-            # If the user has disliked the post, switch to like
-            existing_like.is_like = True
-            post.like_count += 2  # Increase like_count by 2 (remove dislike, add like)
-    else:
-        # Add a new like
-        new_like = Like(user_id=user_id, post_id=post_id, is_like=True)
-        post.like_count += 1  # Increase like_count by 1
-        db.session.add(new_like)
-    
-    db.session.commit()
-    update_user_total_likes(user_id)
-    return jsonify({"message": "Post liked successfully", "like_count": post.like_count}), 200
+    return react_to_post(post_id, True)
 
 # Creating the likes for posts
 @app.route('/dislike_post/<post_id>', methods=['POST'])
 def dislike_post(post_id):
+    return react_to_post(post_id, False)
+
+# Shared like/dislike path: one upsert that also moves like_count
+def react_to_post(post_id, is_like):
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
-    
-    post = Post.query.get(post_id)
-    if not post:
+    verb = "liked" if is_like else "disliked"
+
+    try:
+        result = set_reaction(user_id, post_id, is_like)
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback() # Foreign key on a missing post
+        result = None
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error reacting to post: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+    if result is None:
         return jsonify({"error": "Post not found"}), 404
+    changed, like_count = result
+    if not changed:
+        return jsonify({"message": f"Post already {verb}"}), 400
+    return jsonify({"message": f"Post {verb} successfully", "like_count": like_count}), 200
+
+# Batched reactions: {"reactions": [{"post_id", "reaction": like|dislike|clear, "idempotency_key"}]}
+# Operations on the same post collapse to the last one and the batch commits as one transaction.
+@app.route('/reactions', methods=['POST'])
+def batch_reactions():
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
 
-    # Check if the user has already liked or disliked this post
-    existing_like = Like.query.filter_by(user_id=user_id, post_id=post_id).first()
-
-    if existing_like:
-        if not existing_like.is_like:
-            return jsonify({"message": "Post already disliked"}), 400
-        else:
-            # If the user has liked the post, switch to dislike
-            existing_like.is_like = False
-            post.like_count -= 2  # Decrease like_count by 2 (remove like, add dislike)
-    else:
-        # Add a new dislike
-        new_dislike = Like(user_id=user_id, post_id=post_id, is_like=False)
-        post.like_count -= 1  # Decrease like_count by 1
-        db.session.add(new_dislike)
-    
-    db.session.commit()
-    update_user_total_likes(user_id)
-    return jsonify({"message": "Post disliked successfully", "like_count": post.like_count}), 200
+    operations = (request.get_json(silent=True) or {}).get('reactions')
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"error": "reactions must be a non-empty list"}), 400
+    if len(operations) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"At most {MAX_BATCH_SIZE} reactions per batch"}), 400
+    for op in operations:
+        if not isinstance(op, dict) or not isinstance(op.get('post_id'), str) or op.get('reaction') not in REACTIONS:
+            return jsonify({"error": "Each reaction needs a post_id and a reaction of like, dislike or clear"}), 400
+        key = op.get('idempotency_key')
+        if key is not None and (not isinstance(key, str) or not key):
+            return jsonify({"error": "idempotency_key must be a non-empty string"}), 400
+
+    reactions, skipped = coalesce_operations(user_id, operations)
+    try:
+        if reactions:
+            apply_reactions(user_id, reactions)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error applying reactions: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+    mark_applied(user_id, [op['idempotency_key'] for op in operations if op.get('idempotency_key') and op['idempotency_key'] not in skipped])
+    post_ids = {op['post_id'] for op in operations}
+    return jsonify({"posts": reaction_state(user_id, post_ids), "skipped": sorted(skipped)}), 200
 
-# Update user Likes 
-def update_user_total_likes(user_id):
-    # Calculate the total likes for the user
-    total_likes = db.session.query(db.func.sum(Post.like_count)).filter(Post.user_id == user_id).scalar() or 0
-    user = User.query.get(user_id)
-    user.total_likes = total_likes
-    db.session.commit()
 # Creating the total likes 
 @app.route('/user_total_likes', methods=['GET'])
 def user_total_likes():
@@ -342,16 +463,19 @@ def create_prompt_image():
         return jsonify({"error": "Unathorized"}), 401
     try:
         prompt = request.form.get("prompt")
-        response = client.images.generate(
-            model='dall-e-3',
-            prompt=prompt,
-            size='1024x1024',
-            quality='standard',
-            n=1,
-        )
-        print("DALL-E Response:", response)
-        image_url = response.data[0].url 
+        with get_ai_gateway().call('generate', user_id) as client:
+            response = client.images.generate(
+                model='dall-e-3',
+                prompt=prompt,
+                size='1024x1024',
+                quality='standard',
+                n=1,
+                response_format='b64_json', # The image comes back inline instead of as an expiring link
+            )
+        image_url = persist_generated_image(response.data[0].b64_json)
         return jsonify({"image_url": image_url})
+    except AIUnavailable as e:
+        return jsonify({"error": str(e)}), e.status_code
     except Exception as e:
         print(f"Error Creating a prompted image: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
@@ -397,18 +521,24 @@ def manipulate_image():
         img_byte_arr.seek(0)
 
         # DALL-E image manipulation request
-        response = client.images.edit(
-            image=img_byte_arr,  # Use the BytesIO object directly
-            prompt=prompt,
-            n=1,
-            size="1024x1024",
-        )
+        with get_ai_gateway().call('edit', user_id) as client:
+            response = client.images.edit(
+                image=img_byte_arr,  # Use the BytesIO object directly
+                prompt=prompt,
+                n=1,
+                size="1024x1024",
+                response_format='b64_json',
+            )
        
-        # Extract URL
-        manipulated_image_url = response.data[0].url
+        # Store the result and return our URL
+        manipulated_image_url = persist_generated_image(response.data[0].b64_json)
 
         return jsonify({"manipulated_image_url": manipulated_image_url}), 200
 
+    except HTTPException:
+        raise # Oversized image parts surface as 413
+    except AIUnavailable as e:
+        return jsonify({"error": str(e)}), e.status_code
     except Exception as e:
         print(f"Error manipulating image: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
@@ -432,10 +562,22 @@ def save_post(post_id):
             user_id=user_id,
             content_type=original_post.content_type,
             content_url=original_post.content_url,
-            category=original_post.category
+            media_hash=original_post.media_hash,
+            phash=original_post.phash,
+            category=original_post.category,
+            category_id=original_post.category_id
         )
         db.session.add(new_post)
+        if original_post.media_hash:
+            reference_media(original_post.media_hash) # The copy shares the stored object
+
+        # Bookmark the original post so it shows up in /saved_posts
+        already_saved = db.session.query(saved_posts_table.c.post_id).filter_by(user_id=user_id, post_id=post_id).first()
+        if not already_saved:
+            db.session.execute(saved_posts_table.insert().values(user_id=user_id, post_id=post_id))
         db.session.commit()
+        add_post_to_pool(new_post)
+        fan_out_post(new_post)
 
         return jsonify({"message": "Post saved successfully"}), 201
     except Exception as e:
@@ -448,24 +590,49 @@ def get_saved_post():
     user_id = session.get('user_id')
     if not user_id:
         return jsonify({"error": "Unathorized"}), 401
-    
+    per_page = min(request.args.get('per_page', 20, type=int), 100)
+    cursor = decode_cursor(request.args.get('cursor'))
+
     try: 
-        user = User.query.get(user_id)
+        # Posts and their authors in one joined query, newest bookmark first
+        saved_at = saved_posts_table.c.saved_at
+        query = (
+            db.session.query(Post, User.username, saved_at)
+            .join(saved_posts_table, saved_posts_table.c.post_id == Post.id)
+            .join(User, User.id == Post.user_id)
+            .filter(saved_posts_table.c.user_id == user_id)
+        )
+        if cursor:
+            # Keyset continuation so deep pages cost the same as the first one
+            cursor_saved_at, cursor_post_id = cursor
+            query = query.filter(or_(
+                saved_at < cursor_saved_at,
+                and_(saved_at == cursor_saved_at, Post.id < cursor_post_id)
+            ))
+        rows = query.order_by(desc(saved_at), desc(Post.id)).limit(per_page + 1).all()
+
+        has_next = len(rows) > per_page
+        rows = rows[:per_page]
         saved_posts_data = [
             {
                 'id': post.id,
-                'user_id': post.user.user_id,
-                'username': post.user.username,
+                'user_id': post.user_id,
+                'username': username,
                 'content_type': post.content_type,
                 'content_url': post.content_url,
                 'timestamp': post.timestamp,
-                'category': post.category
+                'category': post.category,
+                'comment_count': post.comment_count,
+                'saved_at': post_saved_at
 
-            } for post in user.saved_posts
+            } for post, username, post_saved_at in rows
         ]
-        if not saved_posts_data:
-            return jsonify({"message": "No saved posts found."}), 200 
-        return jsonify(saved_posts_data), 200
+        last_post, _, last_saved_at = rows[-1] if rows else (None, None, None)
+        return jsonify({
+            'posts': saved_posts_data,
+            'next_cursor': encode_cursor(last_saved_at, last_post.id) if has_next else None,
+            'has_next': has_next
+        }), 200
     except Exception as e:
         print(f"Error getting saved posts: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
@@ -484,19 +651,18 @@ def create_comments():
         return jsonify({"error": "Missing post_id or comment text"}), 400
     
     try:
+        # Bump the counter cache in the same transaction as the insert
+        updated = Post.query.filter_by(id=post_id).update({Post.comment_count: Post.comment_count + 1}, synchronize_session=False)
+        if not updated:
+            return jsonify({"error": "Post not found"}), 404
         new_comment = Comment(user_id=user_id, post_id=post_id, text=text)
         db.session.add(new_comment)
         db.session.commit()
 
         # Optionally, you might want to return the created comment details
-        return jsonify({
-            'id': new_comment.id,
-            'user_id': new_comment.user_id,
-            'post_id': new_comment.post_id,
-            'text': new_comment.text,
-            'timestamp': new_comment.timestamp.isoformat(),
-            'username': new_comment.user.username # Include username
-        }), 201
+        comment_data = serialize_comment(new_comment, get_user_card(user_id))
+        publish_comment(comment_data) # Push to anyone with the thread open
+        return jsonify(comment_data), 201
     
     except Exception as e:
         db.session.rollback()
@@ -504,6 +670,53 @@ def create_comments():
         return jsonify({"error": str(e)}), 500
 
     
+def serialize_comment(comment, card):
+    return {
+        'id': comment.id,
+        'user_id': comment.user_id,
+        'post_id': comment.post_id,
+        'text': comment.text,
+        'timestamp': comment.timestamp.isoformat(),
+        'username': card['username'], # Include username
+        'profile_picture': card['profile_picture'],
+        'cursor': encode_cursor(comment.timestamp, comment.id) # Resume point for /stream_comments
+    }
+
+# Push new comments on an open thread over Server-Sent Events.
+# Clients resume with the Last-Event-ID header (or ?cursor=) and only receive comments after it.
+@app.route('/stream_comments/<post_id>', methods=['GET'])
+def stream_comments(post_id):
+    cursor = request.headers.get('Last-Event-ID') or request.args.get('cursor')
+    position = decode_cursor(cursor)
+
+    pubsub = subscribe_comments(get_broker(), post_id)
+    backlog = []
+    try:
+        if position:
+            cursor_timestamp, cursor_id = position
+            comments = (
+                Comment.query
+                .filter(Comment.post_id == post_id)
+                .filter(or_(
+                    Comment.timestamp > cursor_timestamp,
+                    and_(Comment.timestamp == cursor_timestamp, Comment.id > cursor_id)
+                ))
+                .order_by(Comment.timestamp, Comment.id)
+                .limit(MAX_PENDING_COMMENTS)
+                .all()
+            )
+            cards = get_user_cards(comment.user_id for comment in comments)
+            backlog = [serialize_comment(comment, cards[comment.user_id]) for comment in comments]
+    except Exception as e:
+        pubsub.close()
+        print(f"Error resuming comment stream: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+    stream = stream_comment_updates(pubsub, backlog, cursor=cursor if position else None)
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no' # Stop proxies from buffering the stream
+    })
 
 # In Home page displays all users only comments
 @app.route('/comments/me', methods=["GET"])
@@ -512,14 +725,15 @@ def get_own_comments():
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
     
-    comments = Comment.query.filter_by(user_id=user_id).options(joinedload(Comment.user)).all()
+    comments = Comment.query.filter_by(user_id=user_id).all()
+    card = get_user_card(user_id)
 
     comments_data = [{
         'id': comment.id,
         'post_id': comment.post_id,
         'text': comment.text,
         'timestamp': comment.timestamp,
-        'username': comment.user.username # Include eusername 
+        'username': card['username'] # Include eusername 
 
     } for comment in comments]
 
@@ -534,14 +748,14 @@ def get_posts_comments(post_id):
         comments = (
             Comment.query
             .filter_by(post_id=post_id)
-            .options(joinedload(Comment.user))
-            .order_by(Comment.timestamp)
+            .order_by(Comment.timestamp, Comment.id)
             .all()
         )
         print(comments)
         if not comments:
             return jsonify({"message": "No comments found for this Post"})
         
+        cards = get_user_cards(comment.user_id for comment in comments) # Every author on the thread in one query
         comments_data = []
         for comment in comments:
             comment_data = {
@@ -549,7 +763,9 @@ def get_posts_comments(post_id):
                 'user_id': comment.user_id,
                 'text': comment.text,
                 'timestamp': comment.timestamp,
-                'username': comment.user.username # Include username
+                'username': cards[comment.user_id]['username'], # Include username
+                'profile_picture': cards[comment.user_id]['profile_picture'],
+                'cursor': encode_cursor(comment.timestamp, comment.id) # Resume point for /stream_comments
             }
             comments_data.append(comment_data)
 
@@ -572,33 +788,50 @@ def get_posts():
     # Pagination parameters form query string each a page full of metadata
     page = request.args.get('page', 1, type=int)
     # Creates a max number of posts per page
-    per_page = request.args.get('per_page', 10, type=int)
+    per_page = min(request.args.get('per_page', 10, type=int), 100)
+    cursor = decode_cursor(request.args.get('cursor'))
+
+    # Legacy page numbers walk the timeline from the top, cursors are O(page)
+    limit = per_page if cursor else page * per_page
+    try:
+        post_ids = read_timeline(user_id, cursor, limit)
+    except RedisError as e:
+        print(f"Timeline unavailable, reading from database: {e}")
+        post_ids = [post_id for _, post_id in read_timeline_from_database(user_id, cursor, limit + 1)]
 
-    # Query posts order by timestamp and descending 
-    posts = Post.query.filter_by(user_id=user_id).order_by(desc(Post.timestamp)).paginate(page=page, per_page=per_page, error_out=False)
+    has_next = len(post_ids) > limit
+    post_ids = post_ids[:limit][-per_page:]
 
     # Handle case where no posts are found 
-    if not posts.items:
+    if not post_ids:
         return jsonify({
             'posts': [],
-            'total': 0,
+            'next_cursor': None,
             'has_next': False
         }), 200
+
+    # Hydrate the page in one query and keep timeline order
+    posts_by_id = {post.id: post for post in Post.query.filter(Post.id.in_(post_ids))}
+    posts = [posts_by_id[post_id] for post_id in post_ids if post_id in posts_by_id]
+    cards = get_user_cards(post.user_id for post in posts)
     # Prepare response data: lost of post dictionaries
     return jsonify({
         "posts": [
             {
                 "id": post.id,
                 "user_id": post.user_id,
+                "username": cards[post.user_id]['username'],
                 "content_type": post.content_type,
                 "content_url": post.content_url,
                 "timestamp": post.timestamp,
                 "category": post.category,
+                "comment_count": post.comment_count,
+                "like_count": post.like_count,
             }
-            for post in posts.items # Converts posts object to dictionary
+            for post in posts # Converts posts object to dictionary
         ],
-        "total": posts.total,
-        "has_next": posts.has_next
+        "next_cursor": encode_cursor(posts[-1].timestamp, posts[-1].id) if has_next and posts else None,
+        "has_next": has_next
     }), 200
 
     # Create a new Post 
@@ -610,42 +843,181 @@ def create_post():
     try:
         file = request.files['newImage']
         if file and allowed_file(file.filename):
-            # Get the original filename from the request 
-            filename = secure_filename(file.filename)
-            unique_filename = f"{str(uuid.uuid4())}_{filename}"
-            bucket_name = app.config['GOOGLE_CLOUD_STORAGE_BUCKET']
+            phash = hash_upload(file)
+            near_duplicates = find_near_duplicates(to_unsigned(phash), app.config['PHASH_MAX_DISTANCE']) if phash is not None else []
 
-            # Upload the file to Google Cloud Storage
-            file_url = upload_to_gcs(file, bucket_name, unique_filename)
+            # Upload the file to storage, unless the same bytes are already there
+            file_url, media_hash = store_upload(file)
 
             if not file_url:
-                return jsonify({"error": "Failed to upload to GCS"}), 500
-
-            new_post = Post(
-                user_id=user_id,
-                content_type=request.form.get('content_type', 'image/jpeg' if file.mimetype.startswith('image') else 'video/mp4'),  # Default to 'image/jpeg'
-                content_url=file_url,  # Store the base64 encoded image
-                category=request.form.get('category') # Get Category from request 
+                return jsonify({"error": "Failed to upload media"}), 500
+
+            new_post = publish_post(
+                user_id,
+                request.form.get('content_type', 'image/jpeg' if file.mimetype.startswith('image') else 'video/mp4'),  # Default to 'image/jpeg'
+                file_url,
+                request.form.get('category'), # Get Category from request 
+                media_hash=media_hash,
+                phash=phash
             )
+            created = serialize_created_post(new_post)
+            created["near_duplicate_of"] = near_duplicates[0][0] if near_duplicates else None # Closest earlier post that looks the same
+            return jsonify(created), 201
 
-            db.session.add(new_post)
-            db.session.commit()
-
-            return jsonify({
-                "id": new_post.id,
-                "user_id": new_post.user_id,
-                "content_type": new_post.content_type,
-                "content_url": new_post.content_url,
-                "timestamp": new_post.timestamp,
-                "category": new_post.category
-            }), 201
-
+    except HTTPException:
+            raise
     except Exception as e:
             db.session.rollback()
             print(f"Error creating post: {e}")
             return jsonify({"error": "Internal Server Error"}), 500
   
 
+# Create an image post with captions rendered onto it here, so clients upload the original instead of
+# a re-encoded copy: newImage, top_text and/or bottom_text, category
+@app.route('/posts/captioned', methods=['POST'])
+def create_captioned_post():
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    file = request.files.get('newImage')
+    top_text = request.form.get('top_text', '').strip()
+    bottom_text = request.form.get('bottom_text', '').strip()
+    if not file or not allowed_file(file.filename) or not file.mimetype.startswith('image/'):
+        return jsonify({"error": "An image is required"}), 400
+    if not top_text and not bottom_text:
+        return jsonify({"error": "Missing caption"}), 400
+    if len(top_text) > MAX_CAPTION_LENGTH or len(bottom_text) > MAX_CAPTION_LENGTH:
+        return jsonify({"error": f"Captions are limited to {MAX_CAPTION_LENGTH} characters"}), 400
+
+    try:
+        data, media_hash, phash = caption_upload(file, top_text, bottom_text, FONT_SIZE)
+    except (CaptionBusy, TimeoutError):
+        return jsonify({"error": "Caption rendering is busy, try again shortly"}), 503
+    except UnidentifiedImageError:
+        return jsonify({"error": "Could not read image"}), 400
+    except Exception as e:
+        print(f"Error rendering caption: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+    try:
+        near_duplicates = find_near_duplicates(to_unsigned(phash), app.config['PHASH_MAX_DISTANCE'])
+        file_url = store_media(get_storage(), io.BytesIO(data), media_hash, 'webp', 'image/webp', len(data))
+        new_post = publish_post(user_id, 'image/webp', file_url, request.form.get('category'), media_hash=media_hash, phash=phash)
+        created = serialize_created_post(new_post)
+        created["near_duplicate_of"] = near_duplicates[0][0] if near_duplicates else None
+        return jsonify(created), 201
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error creating captioned post: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+# Insert a post and push it to the explore pools and follower timelines
+def publish_post(user_id, content_type, content_url, category, media_hash=None, phash=None):
+    new_post = Post(
+        user_id=user_id,
+        content_type=content_type,
+        content_url=content_url,
+        media_hash=media_hash,
+        phash=phash,
+        category=category,
+        category_id=get_category_id(category, create=True),
+        hot_score=initial_hot_score()
+    )
+    db.session.add(new_post)
+    db.session.commit()
+    add_post_to_pool(new_post)
+    fan_out_post(new_post)
+    index_post(new_post)
+    return new_post
+
+def serialize_created_post(post):
+    return {
+        "id": post.id,
+        "user_id": post.user_id,
+        "content_type": post.content_type,
+        "content_url": post.content_url,
+        "timestamp": post.timestamp,
+        "category": post.category
+    }
+
+# Direct uploads, step one: {"purpose": "post"|"profile", "content_type", "size", "md5_hash"}.
+# Returns a signed URL so the media goes straight to GCS instead of through this worker.
+@app.route('/uploads', methods=['POST'])
+def start_direct_upload():
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    storage = get_storage()
+    if not isinstance(storage, GCSStorage):
+        return jsonify({"error": "Direct uploads need the GCS storage backend"}), 501
+
+    data = request.get_json(silent=True) or {}
+    purpose, content_type = data.get('purpose'), data.get('content_type')
+    error = validate_upload_request(purpose, content_type, data.get('size'), data.get('md5_hash'))
+    if error:
+        return jsonify({"error": error}), 400
+
+    try:
+        upload = start_upload(storage.bucket(), user_id, purpose, content_type, data['size'], data['md5_hash'])
+        return jsonify(upload), 201
+    except Exception as e:
+        print(f"Error starting direct upload: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+# Direct uploads, step two: verify the object landed as declared, then create the post
+# ({"category"} optional) or set the profile picture
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_direct_upload(upload_id):
+    user_id = session.get('user_id')
+    if not user_id:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    pending = claim_upload(upload_id, user_id)
+    if pending is None:
+        return jsonify({"error": "Upload not found"}), 404
+
+    try:
+        storage = get_storage()
+        if verify_upload(storage.bucket(), pending) is None:
+            release_upload(upload_id, pending)
+            return jsonify({"error": "Upload has not completed"}), 409
+        file_url = storage.url(pending['object_name'])
+
+        if pending['purpose'] == 'profile':
+            release_media(db.session.query(User.profile_media_hash).filter_by(id=user_id).scalar())
+            User.query.filter_by(id=user_id).update({User.profile_picture: file_url, User.profile_media_hash: None}, synchronize_session=False)
+            db.session.commit()
+            invalidate_user_card(user_id)
+            return jsonify({"message": "Profile updated successfully", "profile_picture": file_url}), 200
+
+        # Post.content_type is String(10), videos are recorded as video/mp4 like create_post does
+        content_type = pending['content_type'] if pending['content_type'].startswith('image/') else 'video/mp4'
+        new_post = publish_post(user_id, content_type, file_url, (request.get_json(silent=True) or {}).get('category'))
+        return jsonify(serialize_created_post(new_post)), 201
+    except UploadError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        release_upload(upload_id, pending)
+        print(f"Error finalizing direct upload: {e}")
+        return jsonify({"error": "Internal Server Error"}), 500
+
+def serialize_explore_post(post, cards):
+    return {
+        'id': post.id,
+        'user_id': post.user_id,
+        'username': cards[post.user_id]['username'],
+        'profile_picture': cards[post.user_id]['profile_picture'],
+        'content_type': post.content_type,
+        'content_url': post.content_url,
+        'timestamp': post.timestamp,
+        'category': post.category,
+        'comment_count': post.comment_count,
+        'like_count': post.like_count
+    }
+
  # Get a specific post's details Explore
 @app.route('/explore_posts', methods=['GET'])
 def get_other_post():
@@ -653,29 +1025,49 @@ def get_other_post():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     category = request.args.get('category', default=None)
+    mode = request.args.get('mode', 'random') # 'random' or 'hot'
 
     try:
+        category_id = None
+        if category and category != 'all':
+            category_id = get_category_id(category)
+            if category_id is None: # Unknown category has no posts
+                return jsonify({'posts': [], 'total': 0, 'has_next': False}), 200
+
+        if mode == 'hot':
+            return get_ranked_posts(current_user_id, category_id, per_page)
+
+        if category_id is not None:
+            # Sample the materialized pool instead of sorting the whole table
+            sampled = sample_pool(category_id, per_page * 2) # Oversample to cover the caller's own posts
+            if sampled is not None:
+                post_ids, total = sampled
+                pool_query = Post.query.filter(Post.id.in_(post_ids))
+                if current_user_id:
+                    pool_query = pool_query.filter(Post.user_id != current_user_id)
+                items = pool_query.all()
+                random.shuffle(items)
+                items = dedupe_near_duplicates(items, app.config['PHASH_MAX_DISTANCE'])[:per_page]
+                cards = get_user_cards(post.user_id for post in items)
+                return jsonify({
+                    'posts': [serialize_explore_post(post, cards) for post in items],
+                    'total': total,
+                    'has_next': page * per_page < total
+                }), 200
+
         posts_query = Post.query.filter(Post.content_type != None).order_by(func.random())
 
         if current_user_id:
             posts_query = posts_query.filter(Post.user_id != current_user_id)
 
-        if category and category != 'all':
-            posts_query = posts_query.filter_by(category=category)
+        if category_id is not None:
+            posts_query = posts_query.filter(Post.category_id == category_id)
 
         posts = posts_query.paginate(page=page, per_page=per_page, error_out=False)
+        items = dedupe_near_duplicates(posts.items, app.config['PHASH_MAX_DISTANCE'])
 
-        posts_list = [
-            {
-                'id': post.id,
-                'user_id': post.user_id,
-                'username': post.user.username,
-                'content_type': post.content_type,
-                'content_url': post.content_url,
-                'timestamp': post.timestamp,
-                'category': post.category
-            } for post in posts.items
-        ]
+        cards = get_user_cards(post.user_id for post in items)
+        posts_list = [serialize_explore_post(post, cards) for post in items]
 
         return jsonify({
             'posts': posts_list,
@@ -686,26 +1078,55 @@ def get_other_post():
         print(f"Error getting posts: {e}")
         return jsonify({"error": "Internal Server Error"}), 500
 
+# Ranked explore: range scan down the hot_score index with a (score, id) cursor
+def get_ranked_posts(current_user_id, category_id, per_page):
+    per_page = min(per_page, 100)
+    cursor = decode_score_cursor(request.args.get('cursor'))
+
+    posts_query = Post.query
+    if category_id is not None:
+        posts_query = posts_query.filter(Post.category_id == category_id)
+    if current_user_id:
+        posts_query = posts_query.filter(Post.user_id != current_user_id)
+    if cursor:
+        cursor_score, cursor_id = cursor
+        posts_query = posts_query.filter(or_(
+            Post.hot_score < cursor_score,
+            and_(Post.hot_score == cursor_score, Post.id < cursor_id)
+        ))
+    posts = posts_query.order_by(desc(Post.hot_score), desc(Post.id)).limit(per_page + 1).all()
+
+    has_next = len(posts) > per_page
+    posts = posts[:per_page]
+    next_cursor = encode_score_cursor(posts[-1].hot_score, posts[-1].id) if has_next else None # Before de-duplication drops any
+    posts = dedupe_near_duplicates(posts, app.config['PHASH_MAX_DISTANCE'])
+    cards = get_user_cards(post.user_id for post in posts)
+    return jsonify({
+        'posts': [serialize_explore_post(post, cards) for post in posts],
+        'next_cursor': next_cursor,
+        'has_next': has_next
+    }), 200
+
 # Get another user profile route 
 @app.route('/users/<user_id>', methods=['GET'])
 def get_user_profile(user_id):
     
-    user = User.query.get(user_id) # User query to find user with that user_id
-    print(user)
+    user = load_user_profile(user_id) # User query to find user with that user_id
     if not user: # else error not found
         return jsonify({"error": "Not found"}), 404
-    with open(os.path.join(app.config['UPLOAD_FOLDER'], user.profile_picture), "rb") as image_file:
-        encoded_image = base64.b64encode(image_file.read()).decode('utf-8')
     return jsonify({
         "id": user.id,
         "email": user.email,
         "username": user.username, # including username
-        'profile_picture': encoded_image
+        'profile_picture': user.profile_picture # Media URL from the storage backend, like /users/me
       })
 # Upload file
-@app.route('/uploads/<filename>')
+@app.route('/uploads/<path:filename>')
 def send_image(filename):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    storage = get_storage()
+    if isinstance(storage, LocalStorage):
+        return send_media(storage.root, filename) # Objects of the local backend, e.g. media/ab/<sha256>-....jpg
+    return send_media(app.config['UPLOAD_FOLDER'], filename)
 # Current Logged User
 @app.route('/users/me', methods=["GET"])
 def get_my_profile():
@@ -713,14 +1134,17 @@ def get_my_profile():
     if not user_id:
         return jsonify({"error": "Unauthorized"}), 401
 
-    user = User.query.get(user_id)
-    polls = Poll.query.filter_by(user_id=user_id).all()
+    user = load_user_profile(user_id)
+    if user is None:
+        return jsonify({"error": "Not found"}), 404
+    polls = Poll.query.filter_by(user_id=user_id).options(selectinload(Poll.options)).all() # Options for every poll in one query
 
     poll_data = [{
         'id': poll.id,
         'title': poll.title,
+        'total_votes': poll.total_votes,
         'options': [{'id': option.id, 'text': option.text, 'vote_count': option.vote_count} for option in poll.options],
-        'category': poll.category
+        'category': None # Polls have no category
     } for poll in polls]
 
     return jsonify({
@@ -741,7 +1165,7 @@ def update_profile(user_id):
         # Update Username 
         if 'username' in request.form:
             new_username = request.form['username']
-            if User.query.filter_by(username=new_username).first() and new_username != user.username:
+            if new_username != user.username and user_exists(username=new_username):
                 abort(409, description="Username already exists") # Check for username uniqueness
             user.username = new_username
 
@@ -749,23 +1173,25 @@ def update_profile(user_id):
         if 'profileImage' in request.files:
             file = request.files['profileImage']
             if file and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                unique_filename = f"{str(uuid.uuid4())}_{filename}"
-                bucket_name = app.config['GOOGLE_CLOUD_STORAGE_BUCKET']
-    
-        # Upload to GCS
-                file_url = upload_to_gcs(file, bucket_name, unique_filename)
+        # Upload to storage
+                file_url, media_hash = store_upload(file)
                 if not file_url:
-                    return jsonify({"error": "Failed to upload to GCS"}), 500
+                    return jsonify({"error": "Failed to upload media"}), 500
 
-                user.profile_picture = file_url  # Store the GCS URL
+                release_media(user.profile_media_hash) # The old picture may now be collectable
+                user.profile_picture = file_url  # Store the media URL
+                user.profile_media_hash = media_hash
 
         db.session.commit()
+        invalidate_user_card(user_id) # Serve the new username/picture on this worker right away
         return jsonify({
             "message": "Profile updated successfully",
             "profile_picture": user.profile_picture
         }), 200
 
+    except HTTPException:
+        db.session.rollback()
+        raise
     except Exception as e:
         db.session.rollback()
         print(f"Error updating profile: {e}")
@@ -785,9 +1211,8 @@ def register_user():
         return jsonify({"error": "Invalid email address"}), 400
 
     # If user exists alreadu in data 
-    user_exists = User.query.filter_by(email=email).first() is not None
      # Gives 409 conflict - user exists
-    if user_exists:
+    if user_exists(email=email):
         return jsonify({"error": "User already exists"}), 409
     
     # Generate a 6-digit veriification Code
@@ -806,17 +1231,17 @@ def register_user():
     return jsonify({"message": "Verification code sent to email"}), 200
 
 # Route to verify the email code
-@app.route('/verify_email', methods=['POST']):
+@app.route('/verify_email', methods=['POST'])
 def verify_email():
     data = request.get_json()
     email = data.get('email')
     code = int(data.get('code'))
 
-    if email not in verification_codes or verification_code[email] != code:
-        return jsonify({'error', 'Invalid Verification code'})
-    retur jsonify({"message": "Email verified successfully"})
+    if email not in verification_codes or verification_codes[email] != code:
+        return jsonify({'error': 'Invalid Verification code'}), 400
+    return jsonify({"message": "Email verified successfully"})
 # Finishing Registration
-@app.route('/complete_registration', methods=["POST"]):
+@app.route('/complete_registration', methods=["POST"])
 def complete_registration():
     data = request.get_json()
     email = data.get('email')
@@ -828,8 +1253,7 @@ def complete_registration():
         return jsonify({"error": "Email not verified"})
     
     # Check if username is already taken
-    username_exists = User.query.filter_by(username=username).first() is not None
-    if username_exists:
+    if user_exists(username=username):
         return jsonify({"error": "Username already exists"}), 409
     
     hashed_password = bcrypt.generate_password_hash(password).decode('utf-8')
@@ -855,10 +1279,7 @@ def login_user():
     password = request.json.get('password')
 
     # CHeck if the identifier is an email or username 
-    if '@' in identifier:
-        user = User.query.filter_by(email=identifier).first()
-    else:
-        user = User.query.filter_by(username=identifier).first()
+    user = load_credentials(identifier)
 
     # No user exists
     if user is None:
@@ -874,14 +1295,94 @@ def login_user():
         "username": user.username
     }), 200
 
+# Token login: same credentials as /login, returns an access and refresh token pair
+@app.route('/token', methods=['POST'])
+def issue_token():
+    if not app.config['TOKEN_AUTH_ENABLED']:
+        return jsonify({"error": "Token auth disabled"}), 404
+    identifier = request.json.get('identifier')
+    password = request.json.get('password')
+
+    if not identifier or not password:
+        return jsonify({"error": "Unauthorized"}), 401
+    user = load_credentials(identifier)
+    if user is None or not bcrypt.check_password_hash(user.password, password):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    return jsonify(issue_token_pair(user.id)), 200
+
+# Exchange a refresh token for a new pair, the old refresh token is revoked (rotation)
+@app.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    if not app.config['TOKEN_AUTH_ENABLED']:
+        return jsonify({"error": "Token auth disabled"}), 404
+    claims = verify_token('refresh', (request.get_json(silent=True) or {}).get('refresh_token', ''))
+    if claims is None or not revoke('refresh', claims): # Revoking claims the token, a concurrent refresh loses
+        return jsonify({"error": "Unauthorized"}), 401
+    return jsonify(issue_token_pair(claims['uid'])), 200
+
 # Logout Status 
 @app.route('/logout', methods=['POST'])
 def logout():
+    if isinstance(session, TokenSession):
+        if session.claims is None:
+            return jsonify({"error": "Unauthorized"}), 401
+        # Revoke the access token and, when sent, its refresh token
+        revoke('access', session.claims)
+        refresh_claims = verify_token('refresh', (request.get_json(silent=True) or {}).get('refresh_token', ''))
+        if refresh_claims is not None:
+            revoke('refresh', refresh_claims)
+        return jsonify({"Message": "Logged out successfully"}), 200
+
     session.pop('user_id', None) # Clear the user ID from the sessionn
+    app.session_interface.invalidate(session.sid) # Drop this worker's cached copy right away
     return jsonify({"Message": "Logged out successfully"}), 200
 
 
 
+# Periodic job: rebuild the explore category pools from the posts table
+@app.cli.command('rebuild-category-pools')
+def rebuild_category_pools_command():
+    backfill_category_ids()
+    rebuild_pools()
+    print("Category pools rebuilt")
+
+# One-off: deduplicate Like rows and add the (user_id, post_id) unique key on existing databases
+@app.cli.command('add-like-unique-key')
+def add_like_unique_key_command():
+    removed = add_like_unique_key()
+    print(f"Removed {removed} duplicate reactions, run reconcile-counters to repair like_count")
+
+# One-off after upgrading a SQLite database: pad whole-second timestamps so keyset cursors compare correctly
+@app.cli.command('normalize-sqlite-timestamps')
+def normalize_sqlite_timestamps_command():
+    changed = normalize_sqlite_timestamps([saved_posts_table.c.saved_at, Post.timestamp, Comment.timestamp])
+    print(f"Normalized {changed} timestamps")
+
+# Periodic job: repair comment_count, like_count and total_votes drift
+@app.cli.command('reconcile-counters')
+def reconcile_counters_command():
+    posts_fixed, polls_fixed = reconcile_counters()
+    print(f"Reconciled {posts_fixed} post and {polls_fixed} poll counters")
+
+# Periodic job: delete media objects that lost their last reference over MEDIA_GC_GRACE seconds ago
+@app.cli.command('collect-media-garbage')
+def collect_media_garbage_command():
+    deleted = collect_media_garbage(get_storage(), app.config['MEDIA_GC_GRACE'])
+    print(f"Deleted {deleted} unreferenced media objects")
+
+# Rebuild the perceptual hash index from posts.phash, e.g. after a Redis flush
+@app.cli.command('rebuild-phash-index')
+def rebuild_phash_index_command():
+    indexed = rebuild_index()
+    print(f"Indexed {indexed} perceptual hashes")
+
+# Periodic job: recompute decayed hot scores for ranked explore
+@app.cli.command('refresh-hot-scores')
+def refresh_hot_scores_command():
+    refreshed, expired = refresh_hot_scores()
+    print(f"Refreshed {refreshed} hot scores, expired {expired}")
+
 # Main entry point
 if __name__ == "__main__":
     app.run(debug=True, static_folder='static', host='0.0.0.0')
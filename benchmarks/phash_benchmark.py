@@ -0,0 +1,113 @@
+# Near-duplicate lookup benchmark for the perceptual hash index.
+# Loads a million random 64-bit hashes into the Redis multi-index, then times find_near_duplicates
+# for near copies of indexed hashes (recall) and for unseen hashes, against a linear scan.
+# Uses a scratch Redis database, which it flushes.
+#
+#   python benchmarks/phash_benchmark.py --redis-url redis://127.0.0.1:6379/15 --hashes 1000000
+import argparse
+import io
+import os
+import random
+import statistics
+import sys
+import time
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import redis
+from flask import Flask
+from PIL import Image, ImageDraw
+from perceptual import dhash, hamming, index_hash, find_near_duplicates
+
+LOAD_BATCH_SIZE = 10000
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+def flip_bits(rng, value, count):
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+def load(redis_client, hashes):
+    for start in range(0, len(hashes), LOAD_BATCH_SIZE):
+        pipe = redis_client.pipeline(transaction=False)
+        for offset, value in enumerate(hashes[start:start + LOAD_BATCH_SIZE]):
+            index_hash(pipe, value, f"post{start + offset}")
+        pipe.execute()
+
+def time_lookups(queries, max_distance):
+    samples, results = [], []
+    for value in queries:
+        started = time.perf_counter()
+        results.append(find_near_duplicates(value, max_distance))
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples, results
+
+def report(label, samples):
+    print(f"{label:>24} p50 {statistics.median(samples):.3f} ms  p95 {percentile(samples, 0.95):.3f} ms  p99 {percentile(samples, 0.99):.3f} ms")
+
+# dHash cost at ingestion for a phone-sized JPEG
+def time_dhash(rng, count):
+    image = Image.new('RGB', (3024, 4032))
+    draw = ImageDraw.Draw(image)
+    for _ in range(200):
+        x, y = rng.randrange(3024), rng.randrange(4032)
+        draw.rectangle((x, y, x + rng.randrange(50, 800), y + rng.randrange(50, 800)), fill=tuple(rng.randrange(256) for _ in range(3)))
+    encoded = io.BytesIO()
+    image.save(encoded, 'JPEG', quality=85)
+    samples = []
+    for _ in range(count):
+        encoded.seek(0)
+        started = time.perf_counter()
+        dhash(encoded)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description='Perceptual hash index benchmark')
+    parser.add_argument('--redis-url', default='redis://127.0.0.1:6379/15')
+    parser.add_argument('--hashes', type=int, default=1000000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--max-distance', type=int, default=6)
+    parser.add_argument('--scan-queries', type=int, default=20, help='queries also answered by a linear scan')
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app = Flask(__name__)
+    app.config['SESSION_REDIS'] = redis.from_url(args.redis_url)
+    with app.app_context():
+        redis_client = app.config['SESSION_REDIS']
+        redis_client.flushdb()
+
+        hashes = array('Q', (rng.getrandbits(64) for _ in range(args.hashes)))
+        started = time.perf_counter()
+        load(redis_client, hashes)
+        print(f"indexed {args.hashes} hashes in {time.perf_counter() - started:.1f}s, "
+              f"redis used_memory {redis_client.info('memory').get('used_memory_human', '?')}")
+
+        sources = [rng.randrange(args.hashes) for _ in range(args.queries)]
+        near = [flip_bits(rng, hashes[i], rng.randint(0, args.max_distance)) for i in sources]
+        unseen = [rng.getrandbits(64) for _ in range(args.queries)]
+
+        near_samples, near_results = time_lookups(near, args.max_distance)
+        unseen_samples, _ = time_lookups(unseen, args.max_distance)
+        found = sum(f"post{i}" in {post_id for post_id, _ in result} for i, result in zip(sources, near_results))
+        report('near copy lookup', near_samples)
+        report('unseen hash lookup', unseen_samples)
+        print(f"{'recall':>24} {found}/{args.queries}")
+
+        scan_samples = []
+        for value in near[:args.scan_queries]:
+            started = time.perf_counter()
+            [i for i, other in enumerate(hashes) if hamming(value, other) <= args.max_distance]
+            scan_samples.append((time.perf_counter() - started) * 1000)
+        report('linear scan', scan_samples)
+        report('dhash (12MP jpeg)', time_dhash(rng, 20))
+        redis_client.flushdb()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+# Poll creation benchmark: the ORM path create_poll used to take (add the Poll, flush for its id, add
+# each PollOption) against polls.create_polls (client-side ids, one multi-row INSERT per table).
+# Times single-poll requests and batch imports, counting statements sent per request.
+# Run against a database filled by seed_data.py; the polls it creates are deleted afterwards.
+#
+#   python benchmarks/poll_benchmark.py --database-uri sqlite:///bench.db --polls 500 --options 5
+import argparse
+import os
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask
+from sqlalchemy import event, delete
+from database import db
+from models import User, Poll, PollOption
+from polls import create_polls
+
+def orm_create(user_id, poll):
+    new_poll = Poll(title=poll['title'], user_id=user_id)
+    db.session.add(new_poll)
+    db.session.flush()
+    for option_text in poll['options']:
+        db.session.add(PollOption(text=option_text, poll_id=new_poll.id))
+    return [new_poll.id]
+
+def bulk_create(user_id, poll):
+    return create_polls(user_id, [poll])
+
+STRATEGIES = [('ORM add/flush', orm_create), ('bulk insert', bulk_create)]
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self.before_cursor_execute)
+
+    def before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+def make_polls(count, options, tag):
+    return [{'title': f"{tag} poll {i}", 'options': [f"option {j}" for j in range(options)]} for i in range(count)]
+
+def delete_polls(poll_ids):
+    for start in range(0, len(poll_ids), 500):
+        chunk = poll_ids[start:start + 500]
+        db.session.execute(delete(PollOption).where(PollOption.poll_id.in_(chunk)))
+        db.session.execute(delete(Poll).where(Poll.id.in_(chunk)))
+    db.session.commit()
+
+def report(label, samples, statements):
+    print(f"{label:<22} p50 {statistics.median(samples):>7.3f} ms  mean {statistics.mean(samples):>7.3f} ms  "
+          f"{statements / len(samples):>6.1f} statements/request")
+
+def main():
+    parser = argparse.ArgumentParser(description='Poll creation benchmark')
+    parser.add_argument('--database-uri', default=os.getenv('DATABASE_URI', 'sqlite:///bench.db'))
+    parser.add_argument('--polls', type=int, default=500)
+    parser.add_argument('--options', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+
+    app = Flask(__name__, instance_path=os.path.join(ROOT, 'instance')) # Same sqlite location as app.py
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    db.init_app(app)
+    with app.app_context():
+        user_id = db.session.query(User.id).limit(1).scalar()
+        if user_id is None:
+            sys.exit('No users, run seed_data.py first')
+        counter = StatementCounter(db.engine)
+        created = []
+        try:
+            # One poll per request, committed like create_poll does
+            for name, strategy in STRATEGIES:
+                samples = []
+                counter.count = 0
+                for poll in make_polls(args.polls, args.options, name):
+                    started = time.perf_counter()
+                    created.extend(strategy(user_id, poll))
+                    db.session.commit()
+                    samples.append((time.perf_counter() - started) * 1000)
+                report(name, samples, counter.count)
+
+            # A survey import through /create_polls, and the same polls created one by one in a single transaction
+            batches = [make_polls(args.batch_size, args.options, f"batch {i}") for i in range(max(1, args.polls // args.batch_size))]
+            for label, create in (('ORM batch', lambda polls: [poll_id for poll in polls for poll_id in orm_create(user_id, poll)]),
+                                  ('bulk batch', lambda polls: create_polls(user_id, polls))):
+                samples = []
+                counter.count = 0
+                for polls in batches:
+                    started = time.perf_counter()
+                    created.extend(create(polls))
+                    db.session.commit()
+                    samples.append((time.perf_counter() - started) * 1000)
+                report(f"{label} of {args.batch_size}", samples, counter.count)
+        finally:
+            db.session.rollback()
+            delete_polls(created)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Memory/latency comparison of ways to read a 1,000-row page of users:
+# full ORM hydration (deferral undone), ORM with deferred columns, column tuples and slotted dataclasses.
+# Run against a database filled by seed_data.py.
+#
+#   python benchmarks/projection_benchmark.py --database-uri sqlite:///bench.db
+import argparse
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask
+from sqlalchemy.orm import undefer
+from database import db
+from models import User
+from projections import UserProfile
+
+def full_orm(offset, limit):
+    return User.query.options(undefer(User.email), undefer(User.password)).order_by(User.id).offset(offset).limit(limit).all()
+
+def deferred_orm(offset, limit):
+    return User.query.order_by(User.id).offset(offset).limit(limit).all()
+
+def tuples(offset, limit):
+    return db.session.query(User.id, User.email, User.username, User.profile_picture).order_by(User.id).offset(offset).limit(limit).all()
+
+def dataclasses(offset, limit):
+    return [UserProfile(*row) for row in tuples(offset, limit)]
+
+STRATEGIES = [('full ORM', full_orm), ('deferred ORM', deferred_orm), ('row tuples', tuples), ('slotted dataclass', dataclasses)]
+
+def measure(strategy, pages, page_size):
+    timings = []
+    peaks = []
+    for page in range(pages):
+        db.session.expunge_all() # Every page starts from an empty identity map
+        tracemalloc.start()
+        started = time.perf_counter()
+        rows = strategy(page * page_size, page_size)
+        timings.append((time.perf_counter() - started) * 1000)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        del rows
+    return timings, peaks
+
+def main():
+    parser = argparse.ArgumentParser(description='User projection benchmark')
+    parser.add_argument('--database-uri', default=os.getenv('DATABASE_URI', 'sqlite:///bench.db'))
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--page-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    app = Flask(__name__, instance_path=os.path.join(ROOT, 'instance')) # Same sqlite location as app.py
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    db.init_app(app)
+    with app.app_context():
+        measure(tuples, 1, args.page_size) # Warm the connection and statement caches
+        print(f"{'strategy':<18} {'p50 ms':>8} {'mean ms':>8} {'peak KiB':>9}")
+        for name, strategy in STRATEGIES:
+            timings, peaks = measure(strategy, args.pages, args.page_size)
+            print(f"{name:<18} {statistics.median(timings):>8.2f} {statistics.mean(timings):>8.2f} {statistics.mean(peaks) / 1024:>9.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+# End-to-end API benchmark.
+# Drives the Flask app in-process through the test client (or a running server with --base-url)
+# and reports p50/p95/p99 latency, SQL queries per request and throughput per route.
+# GCS, OpenAI and SMTP are replaced by the offline stand-ins in stand_ins.py.
+#
+#   python benchmarks/seed_data.py --database-uri sqlite:///bench.db --reset
+#   python benchmarks/run_benchmark.py --database-uri sqlite:///bench.db --requests 5000 --concurrency 8
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import defaultdict
+from sqlalchemy import event
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import stand_ins
+from seed_data import BENCH_PASSWORD
+
+ROUTES = ['explore_posts', 'posts', 'vote_poll', 'like_post', 'newComments']
+
+_query_counter = threading.local()
+
+def count_queries(conn, cursor, statement, parameters, context, executemany):
+    _query_counter.value = getattr(_query_counter, 'value', 0) + 1
+
+# Requests for each route, picking targets from the sampled ids
+def make_request(route, rng, targets):
+    if route == 'explore_posts':
+        return 'GET', '/explore_posts?per_page=10'
+    if route == 'posts':
+        return 'GET', '/posts?per_page=10'
+    if route == 'vote_poll':
+        poll_id, option_ids = rng.choice(targets['polls'])
+        return 'POST', f"/vote_poll/{poll_id}/{rng.choice(option_ids)}"
+    if route == 'like_post':
+        return 'POST', f"/like_post/{rng.choice(targets['posts'])}"
+    if route == 'newComments':
+        return 'GET', f"/newComments/{rng.choice(targets['posts'])}"
+    raise ValueError(f"Unknown route {route}")
+
+def load_targets(db, models, sample):
+    User, Post, Poll, PollOption = models
+    user_ids = [row.id for row in db.session.query(User.id).filter(User.username.like('bench%')).limit(sample)]
+    post_ids = [row.id for row in db.session.query(Post.id).limit(sample * 5)]
+    polls = defaultdict(list)
+    for row in db.session.query(PollOption.poll_id, PollOption.id).limit(sample * 4):
+        polls[row.poll_id].append(row.id)
+    return {'users': user_ids, 'posts': post_ids, 'polls': list(polls.items())}
+
+class InProcessClient:
+    def __init__(self, app, user_id):
+        self.client = app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['user_id'] = user_id
+
+    def send(self, method, path):
+        _query_counter.value = 0
+        response = self.client.open(path, method=method)
+        return response.status_code, _query_counter.value
+
+class RemoteClient:
+    def __init__(self, base_url, username):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+        self.session.post(f"{self.base_url}/login", json={'identifier': username, 'password': BENCH_PASSWORD})
+
+    def send(self, method, path):
+        response = self.session.request(method, f"{self.base_url}{path}")
+        return response.status_code, None
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+def report(results, wall_seconds):
+    print(f"{'route':<15} {'count':>7} {'errors':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'req/s':>8}")
+    for route in ROUTES:
+        rows = results.get(route)
+        if not rows:
+            continue
+        latencies = [latency for latency, _, _ in rows]
+        errors = sum(1 for _, status, _ in rows if status >= 500)
+        queries = [count for _, _, count in rows if count is not None]
+        query_column = f"{sum(queries) / len(queries):.1f}" if queries else '-'
+        print(f"{route:<15} {len(rows):>7} {errors:>7} {percentile(latencies, 0.50):>8.2f} {percentile(latencies, 0.95):>8.2f} "
+              f"{percentile(latencies, 0.99):>8.2f} {query_column:>8} {len(rows) / wall_seconds:>8.1f}")
+    total = sum(len(rows) for rows in results.values())
+    print(f"total: {total} requests in {wall_seconds:.1f}s ({total / wall_seconds:.1f} req/s)")
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end API benchmark')
+    parser.add_argument('--database-uri', default=os.getenv('DATABASE_URI', 'sqlite:///bench.db'))
+    parser.add_argument('--base-url', help='benchmark a running server instead of the in-process test client')
+    parser.add_argument('--routes', default=','.join(ROUTES))
+    parser.add_argument('--requests', type=int, default=2000, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--sample', type=int, default=1000, help='users, posts and polls sampled as targets')
+    parser.add_argument('--cookie-sessions', action='store_true', help='use signed cookie sessions instead of Redis')
+    parser.add_argument('--seed', type=int, default=11)
+    args = parser.parse_args()
+    routes = [route for route in args.routes.split(',') if route]
+
+    stand_ins.prepare_environment(args.database_uri)
+    import app as app_module
+    from database import db
+    from models import User, Post, Poll, PollOption
+    stand_ins.install(app_module)
+    app = app_module.app
+    if args.cookie_sessions:
+        from flask.sessions import SecureCookieSessionInterface
+        app.session_interface = SecureCookieSessionInterface()
+
+    with app.app_context():
+        db.engine.echo = False
+        event.listen(db.engine, 'before_cursor_execute', count_queries)
+        targets = load_targets(db, (User, Post, Poll, PollOption), args.sample)
+        usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(targets['users'])))
+    if not targets['users'] or not targets['posts']:
+        sys.exit('No benchmark data found, run benchmarks/seed_data.py first')
+
+    work = [route for route in routes for _ in range(args.requests)]
+    random.Random(args.seed).shuffle(work)
+    chunks = [work[i::args.concurrency] for i in range(args.concurrency)]
+    results = defaultdict(list)
+    lock = threading.Lock()
+
+    def worker(index):
+        rng = random.Random(args.seed + index)
+        user_id = targets['users'][index % len(targets['users'])]
+        client = RemoteClient(args.base_url, usernames[user_id]) if args.base_url else InProcessClient(app, user_id)
+        local = defaultdict(list)
+        for route in chunks[index]:
+            method, path = make_request(route, rng, targets)
+            started = time.perf_counter()
+            status, queries = client.send(method, path)
+            local[route].append(((time.perf_counter() - started) * 1000, status, queries))
+        with lock:
+            for route, rows in local.items():
+                results[route].extend(rows)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(worker, range(args.concurrency)))
+    report(results, time.perf_counter() - started)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+# Bulk seed-data generator for load testing.
+# Inserts realistic Users, Follows, Posts, Comments, Likes, Polls, PollOptions and PollVotes
+# with counter caches already consistent. PostgreSQL uses COPY, everything else uses
+# executemany (SQLAlchemy insertmanyvalues).
+#
+#   DATABASE_URI=postgresql://... python benchmarks/seed_data.py --users 10000 --posts 1000000
+import argparse
+import csv
+import io
+import os
+import random
+import sys
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from flask import Flask
+from database import db
+from models import User, Follow, Category, Post, Comment, Like, Poll, PollOption, PollVote, get_uuid
+from ranking import hot_score
+
+BATCH_SIZE = 10000
+BENCH_PASSWORD = 'benchmark' # Every seeded user logs in with this password
+CATEGORIES = ['sports', 'food', 'music', 'memes', 'events', 'housing', 'study', 'fashion', 'art', 'clubs']
+COMMENT_TEXTS = ['this is great', 'lol', 'where is this?', 'same', 'see you there', 'so true', 'who made this', 'fight on']
+POLL_TITLES = ['Best dining hall?', 'Favorite study spot?', 'Game day plans?', 'Best late night food?']
+
+# Stream rows into a table: COPY on PostgreSQL, executemany elsewhere
+def bulk_insert(table, columns, rows):
+    rows = iter(rows)
+    inserted = 0
+    postgres = db.engine.dialect.name == 'postgresql'
+    while True:
+        batch = [row for _, row in zip(range(BATCH_SIZE), rows)]
+        if not batch:
+            break
+        if postgres:
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(batch)
+            buffer.seek(0)
+            raw = db.session.connection().connection.dbapi_connection
+            with raw.cursor() as cursor:
+                cursor.copy_expert(f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        else:
+            db.session.execute(table.insert(), [dict(zip(columns, row)) for row in batch])
+        inserted += len(batch)
+    db.session.commit()
+    return inserted
+
+def _unique_pairs(rng, count, left, right):
+    seen = set()
+    count = min(count, left * right)
+    while len(seen) < count:
+        seen.add(rng.randrange(left) * right + rng.randrange(right))
+    return [divmod(pair, right) for pair in seen]
+
+def seed(options, log=print):
+    rng = random.Random(options.seed)
+    now = datetime.now(timezone.utc)
+    started = time.perf_counter()
+
+    # One bcrypt hash shared by every seeded user, hashing a million passwords is not the point
+    from flask_bcrypt import generate_password_hash
+    password_hash = generate_password_hash(BENCH_PASSWORD).decode('utf-8')
+
+    bulk_insert(Category.__table__, ['id', 'name'], [(i + 1, name) for i, name in enumerate(CATEGORIES)])
+
+    user_ids = [get_uuid() for _ in range(options.users)]
+    follows = _unique_pairs(rng, options.users * options.follows_per_user, options.users, options.users)
+    follows = [(a, b) for a, b in follows if a != b]
+    follower_counts = array('i', bytes(4 * options.users))
+    following_counts = array('i', bytes(4 * options.users))
+    for follower, followed in follows:
+        follower_counts[followed] += 1
+        following_counts[follower] += 1
+    bulk_insert(User.__table__, ['id', 'email', 'password', 'username', 'follower_count', 'following_count'], (
+        (user_id, f"bench{i}@usc.edu", password_hash, f"bench{i}", follower_counts[i], following_counts[i])
+        for i, user_id in enumerate(user_ids)
+    ))
+    bulk_insert(Follow.__table__, ['follower_id', 'followed_id', 'created_at'], (
+        (user_ids[a], user_ids[b], now) for a, b in follows
+    ))
+    log(f"users: {options.users}, follows: {len(follows)}")
+
+    # Interactions first so the posts go in with their counters already filled
+    post_ids = [get_uuid() for _ in range(options.posts)]
+    likes = _unique_pairs(rng, options.likes, options.users, options.posts)
+    like_counts = array('i', bytes(4 * options.posts))
+    like_flags = [rng.random() < 0.85 for _ in likes]
+    for (_, post), is_like in zip(likes, like_flags):
+        like_counts[post] += 1 if is_like else -1
+    comment_posts = [rng.randrange(options.posts) for _ in range(options.comments)]
+    comment_counts = array('i', bytes(4 * options.posts))
+    for post in comment_posts:
+        comment_counts[post] += 1
+
+    window = timedelta(days=options.days).total_seconds()
+    post_ages = [rng.random() * window for _ in range(options.posts)]
+    bulk_insert(Post.__table__, ['id', 'user_id', 'content_type', 'content_url', 'timestamp', 'category', 'category_id',
+                                 'like_count', 'comment_count', 'hot_score'], (
+        (post_id, user_ids[rng.randrange(options.users)], 'image/jpeg' if i % 5 else 'video/mp4',
+         f"https://storage.googleapis.com/bench/{post_id}.jpg", now - timedelta(seconds=post_ages[i]),
+         CATEGORIES[i % len(CATEGORIES)], i % len(CATEGORIES) + 1, like_counts[i], comment_counts[i],
+         hot_score(like_counts[i], comment_counts[i], post_ages[i] / 3600) if post_ages[i] < 7 * 86400 else 0)
+        for i, post_id in enumerate(post_ids)
+    ))
+    log(f"posts: {options.posts}")
+
+    bulk_insert(Like.__table__, ['user_id', 'post_id', 'is_like'], (
+        (user_ids[user], post_ids[post], is_like) for (user, post), is_like in zip(likes, like_flags)
+    ))
+    bulk_insert(Comment.__table__, ['id', 'post_id', 'user_id', 'text', 'timestamp'], (
+        (get_uuid(), post_ids[post], user_ids[rng.randrange(options.users)], rng.choice(COMMENT_TEXTS),
+         now - timedelta(seconds=rng.random() * post_ages[post]))
+        for post in comment_posts
+    ))
+    log(f"likes: {len(likes)}, comments: {options.comments}")
+
+    poll_ids = [get_uuid() for _ in range(options.polls)]
+    option_ids = [[get_uuid() for _ in range(options.options_per_poll)] for _ in poll_ids]
+    votes = _unique_pairs(rng, options.poll_votes, options.users, options.polls)
+    vote_choices = [rng.randrange(options.options_per_poll) for _ in votes]
+    option_votes = {}
+    poll_votes = array('i', bytes(4 * options.polls))
+    for (_, poll), choice in zip(votes, vote_choices):
+        option_votes[(poll, choice)] = option_votes.get((poll, choice), 0) + 1
+        poll_votes[poll] += 1
+    bulk_insert(Poll.__table__, ['id', 'title', 'user_id', 'total_votes'], (
+        (poll_id, rng.choice(POLL_TITLES), user_ids[rng.randrange(options.users)], poll_votes[i])
+        for i, poll_id in enumerate(poll_ids)
+    ))
+    bulk_insert(PollOption.__table__, ['id', 'poll_id', 'text', 'vote_count'], (
+        (option_id, poll_ids[poll], f"Option {choice + 1}", option_votes.get((poll, choice), 0))
+        for poll, options_for_poll in enumerate(option_ids) for choice, option_id in enumerate(options_for_poll)
+    ))
+    bulk_insert(PollVote.__table__, ['user_id', 'poll_id', 'option_id'], (
+        (user_ids[user], poll_ids[poll], option_ids[poll][choice]) for (user, poll), choice in zip(votes, vote_choices)
+    ))
+    log(f"polls: {options.polls}, poll votes: {len(votes)}")
+    log(f"seeded in {time.perf_counter() - started:.1f}s")
+
+def build_parser():
+    parser = argparse.ArgumentParser(description='Bulk seed data for benchmarks')
+    parser.add_argument('--database-uri', default=os.getenv('DATABASE_URI', 'sqlite:///bench.db'))
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--follows-per-user', type=int, default=50)
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--comments', type=int, default=500000)
+    parser.add_argument('--likes', type=int, default=1000000)
+    parser.add_argument('--polls', type=int, default=10000)
+    parser.add_argument('--options-per-poll', type=int, default=4)
+    parser.add_argument('--poll-votes', type=int, default=200000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--reset', action='store_true', help='drop and recreate every table first')
+    return parser
+
+def main():
+    options = build_parser().parse_args()
+    app = Flask(__name__, instance_path=os.path.join(ROOT, 'instance')) # Same sqlite location as app.py
+    app.config['SQLALCHEMY_DATABASE_URI'] = options.database_uri
+    db.init_app(app)
+    with app.app_context():
+        if options.reset:
+            db.drop_all()
+        db.create_all()
+        seed(options)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# Offline stand-ins for the external services app.py talks to, so benchmarks never leave the machine.
+import base64
+import os
+import shutil
+from types import SimpleNamespace
+
+# 1x1 transparent PNG returned by the fake image endpoints
+TINY_PNG = base64.b64decode(
+    'iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mNkYPhfDwAChwGA60e6kgAAAABJRU5ErkJggg=='
+)
+
+# google.cloud.storage.Client replacement writing blobs under a local directory
+class LocalStorageClient:
+    root = os.path.join('benchmarks', '.gcs')
+
+    def get_bucket(self, bucket_name):
+        return LocalBucket(os.path.join(self.root, bucket_name))
+
+    bucket = get_bucket
+
+class LocalBucket:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def blob(self, name):
+        return LocalBlob(os.path.join(self.path, name))
+
+class LocalBlob:
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True) # Object names may contain '/'
+
+    def upload_from_file(self, file, content_type=None, **kwargs):
+        with open(self.path, 'wb') as out:
+            shutil.copyfileobj(file, out)
+
+    def delete(self):
+        if os.path.exists(self.path): # Missing objects count as deleted, like GCSStorage.delete
+            os.remove(self.path)
+
+    def upload_from_string(self, data, content_type=None, **kwargs):
+        with open(self.path, 'wb') as out:
+            out.write(data if isinstance(data, bytes) else data.encode('utf-8'))
+
+# OpenAI client replacement answering image calls instantly
+class FakeImages:
+    def _response(self):
+        return SimpleNamespace(data=[SimpleNamespace(
+            url='https://example.invalid/generated.png',
+            b64_json=base64.b64encode(TINY_PNG).decode('ascii')
+        )])
+
+    def generate(self, **kwargs):
+        return self._response()
+
+    def edit(self, **kwargs):
+        return self._response()
+
+class FakeOpenAI:
+    def __init__(self, *args, **kwargs):
+        self.images = FakeImages()
+
+    def with_options(self, **kwargs):
+        return self
+
+# smtplib.SMTP replacement that accepts and drops every message
+class FakeSMTP:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def sendmail(self, sender, recipient, message):
+        pass
+
+# Swap the stand-ins into an imported app module
+def install(app_module):
+    app_module.storage = SimpleNamespace(Client=LocalStorageClient)
+    app_module.app.extensions['ai_gateway'].client = FakeOpenAI()
+    app_module.smtplib = SimpleNamespace(SMTP=FakeSMTP)
+
+# Environment app.py and config.py expect at import time
+def prepare_environment(database_uri):
+    os.environ.setdefault('SECRET_KEY', 'benchmark-secret')
+    os.environ['DATABASE_URI'] = database_uri
+    os.environ.setdefault('GOOGLE_CLOUD_STORAGE_BUCKET', 'bench')
+    os.environ.setdefault('GOOGLE_APPLICATION_CREDENTIALS', os.devnull)
@@ -0,0 +1,129 @@
+# Home timeline benchmark over a synthetic social graph.
+# Compares precomputed Redis timelines (fan-out-on-write with celebrity merge)
+# against fan-out-on-read SQL for users bucketed by how many accounts they follow.
+#
+#   python benchmarks/timeline_benchmark.py --database-uri sqlite:///timeline_bench.db --redis-url redis://127.0.0.1:6379/15
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import redis
+from flask import Flask
+from sqlalchemy import insert, bindparam
+from database import db
+from models import User, Post, Follow, get_uuid
+from timeline import fan_out_post, read_timeline, read_timeline_from_database
+
+BUCKETS = [(0, 10), (10, 100), (100, 1000), (1000, None)]
+
+def create_bench_app(args):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    app.config['SESSION_REDIS'] = redis.from_url(args.redis_url)
+    app.config['TIMELINE_FANOUT_LIMIT'] = args.fanout_limit
+    db.init_app(app)
+    return app
+
+# Preferential attachment: a few accounts collect most of the followers
+def build_graph(args):
+    rng = random.Random(args.seed)
+    user_ids = [get_uuid() for _ in range(args.users)]
+    db.session.execute(insert(User), [
+        {'id': user_id, 'username': f"bench_{i}", 'email': f"bench_{i}@usc.edu", 'password': 'x'}
+        for i, user_id in enumerate(user_ids)
+    ])
+
+    weights = [rng.paretovariate(1.2) for _ in user_ids]
+    followers = {user_id: 0 for user_id in user_ids}
+    following = {user_id: 0 for user_id in user_ids}
+    edges = []
+    for user_id in user_ids:
+        wanted = min(int(rng.expovariate(1 / args.mean_following)) + 1, args.users - 1)
+        for followed_id in set(rng.choices(user_ids, weights=weights, k=wanted)):
+            if followed_id != user_id:
+                edges.append({'follower_id': user_id, 'followed_id': followed_id})
+                followers[followed_id] += 1
+                following[user_id] += 1
+    db.session.execute(insert(Follow), edges)
+    db.session.execute(
+        User.__table__.update().where(User.id == bindparam('b_id')).values(
+            follower_count=bindparam('b_followers'), following_count=bindparam('b_following')),
+        [{'b_id': user_id, 'b_followers': followers[user_id], 'b_following': following[user_id]} for user_id in user_ids]
+    )
+
+    start = datetime.now(timezone.utc) - timedelta(days=30)
+    posts = [
+        {'id': get_uuid(), 'user_id': user_id, 'content_type': 'image/jpeg', 'content_url': 'https://example.invalid/x.jpg',
+         'timestamp': start + timedelta(seconds=rng.randrange(30 * 86400)), 'like_count': 0}
+        for user_id in user_ids for _ in range(args.posts_per_user)
+    ]
+    posts.sort(key=lambda row: row['timestamp'])
+    db.session.execute(insert(Post), posts)
+    db.session.commit()
+    return user_ids, len(edges), len(posts)
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+def time_reads(read, user_ids, per_page):
+    samples = []
+    for user_id in user_ids:
+        started = time.perf_counter()
+        first = read(user_id, None, per_page)
+        if len(first) > per_page: # Second page through the cursor
+            post = db.session.get(Post, first[per_page - 1])
+            read(user_id, (post.timestamp, post.id), per_page)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description='Home timeline benchmark')
+    parser.add_argument('--database-uri', default='sqlite:///timeline_bench.db')
+    parser.add_argument('--redis-url', default='redis://127.0.0.1:6379/15')
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--mean-following', type=int, default=80)
+    parser.add_argument('--posts-per-user', type=int, default=10)
+    parser.add_argument('--fanout-limit', type=int, default=500)
+    parser.add_argument('--sample', type=int, default=200)
+    parser.add_argument('--per-page', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    app = create_bench_app(args)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        app.config['SESSION_REDIS'].flushdb()
+
+        started = time.perf_counter()
+        user_ids, edge_count, post_count = build_graph(args)
+        print(f"graph: {len(user_ids)} users, {edge_count} follows, {post_count} posts ({time.perf_counter() - started:.1f}s)")
+
+        started = time.perf_counter()
+        for post in Post.query.order_by(Post.timestamp).yield_per(1000):
+            fan_out_post(post)
+        print(f"fan-out on write: {(time.perf_counter() - started) * 1000 / post_count:.2f} ms/post")
+
+        counts = dict(db.session.query(User.id, User.following_count))
+
+        print(f"{'following':>12} {'users':>6} {'timeline p50':>13} {'p95':>8} {'sql p50':>9} {'p95':>8}")
+        for low, high in BUCKETS:
+            bucket = [user_id for user_id in user_ids if counts.get(user_id, 0) >= low and (high is None or counts.get(user_id, 0) < high)]
+            if not bucket:
+                continue
+            sample = random.Random(args.seed).sample(bucket, min(args.sample, len(bucket)))
+            timeline = time_reads(read_timeline, sample, args.per_page)
+            sql = time_reads(lambda user_id, before, limit: [post_id for _, post_id in read_timeline_from_database(user_id, before, limit + 1)], sample, args.per_page)
+            label = f"{low}-{high - 1}" if high else f"{low}+"
+            print(f"{label:>12} {len(sample):>6} {statistics.median(timeline):>10.2f} ms {percentile(timeline, 0.95):>5.2f} ms "
+                  f"{statistics.median(sql):>6.2f} ms {percentile(sql, 0.95):>5.2f} ms")
+
+if __name__ == '__main__':
+    main()
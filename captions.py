@@ -0,0 +1,116 @@
+import hashlib
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from flask import current_app # For config and the per-app pool
+from PIL import Image, ImageDraw, ImageFont, ImageOps
+from perceptual import dhash, to_signed
+
+# Meme-style captions: white text with a black outline, centred at the top and bottom of the image.
+# Text layers are rendered once for a REFERENCE_WIDTH wide image and scaled to each target, so the same
+# caption on any image is a cache hit. Fonts are loaded once per process, which also keeps FreeType's
+# glyph cache warm between renders.
+REFERENCE_WIDTH = 1024 # DALL-E output width
+MARGIN = 16 # Reference pixels between the text and the image edge
+MAX_DIMENSION = 2048 # Larger images are downscaled before compositing
+MAX_CAPTION_LENGTH = 200
+TEXT_LAYER_CACHE_SIZE = 256
+
+class CaptionBusy(Exception):
+    pass
+
+# Process-wide font cache; path None is Pillow's bundled font
+@lru_cache(maxsize=None)
+def get_font(path, size):
+    if path:
+        return ImageFont.truetype(path, size)
+    return ImageFont.load_default(size)
+
+# Greedy word wrap to max_width pixels, over-long words get a line of their own
+def wrap_text(text, font, max_width):
+    lines = []
+    for paragraph in text.splitlines() or ['']:
+        line = ''
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if line and font.getlength(candidate) > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return '\n'.join(lines)
+
+# Transparent REFERENCE_WIDTH wide layer holding the rendered caption, shared between requests: never mutate it
+@lru_cache(maxsize=TEXT_LAYER_CACHE_SIZE)
+def text_layer(text, font_path, size):
+    font = get_font(font_path, size)
+    stroke = max(1, size // 12)
+    wrapped = wrap_text(text, font, REFERENCE_WIDTH - 2 * MARGIN - 2 * stroke)
+    measure = ImageDraw.Draw(Image.new('L', (1, 1)))
+    left, top, right, bottom = measure.multiline_textbbox((0, 0), wrapped, font=font, stroke_width=stroke, align='center')
+    layer = Image.new('RGBA', (REFERENCE_WIDTH, bottom - top))
+    ImageDraw.Draw(layer).multiline_text(
+        (REFERENCE_WIDTH // 2, -top), wrapped, font=font, anchor='ma', align='center',
+        fill='white', stroke_width=stroke, stroke_fill='black'
+    )
+    return layer
+
+# Burn the captions into an image, returns WebP bytes
+def render_caption(fp, top_text, bottom_text, font_path, size, quality):
+    with Image.open(fp) as source:
+        source.draft('RGB', (MAX_DIMENSION, MAX_DIMENSION)) # JPEGs decode at a reduced scale when large
+        image = ImageOps.exif_transpose(source).convert('RGBA') # Phone photos are stored sideways with an EXIF tag
+    image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.Resampling.LANCZOS)
+
+    scale = image.width / REFERENCE_WIDTH
+    margin = round(MARGIN * scale)
+    for text, at_top in ((top_text, True), (bottom_text, False)):
+        if not text:
+            continue
+        layer = text_layer(text, font_path, size)
+        if scale != 1:
+            layer = layer.resize((image.width, max(1, round(layer.height * scale))), Image.Resampling.LANCZOS)
+        layer = layer.crop((0, 0, image.width, min(layer.height, image.height)))
+        y = margin if at_top else image.height - layer.height - margin
+        image.alpha_composite(layer, (0, min(max(0, y), image.height - layer.height)))
+
+    encoded = io.BytesIO()
+    image.save(encoded, 'WEBP', quality=quality, method=4)
+    return encoded.getvalue()
+
+# Render on the pool; returns (webp bytes, sha256, signed dHash) for the caller to store
+def _render(fp, top_text, bottom_text, font_path, size, quality):
+    data = render_caption(fp, top_text, bottom_text, font_path, size, quality)
+    return data, hashlib.sha256(data).hexdigest(), to_signed(dhash(io.BytesIO(data)))
+
+# Bounded pool: CAPTION_WORKERS threads composite, at most CAPTION_MAX_PENDING renders queue or run
+class CaptionRenderer:
+    def __init__(self, workers, max_pending, timeout):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='captions')
+        self.timeout = timeout
+        self._pending = threading.BoundedSemaphore(max_pending)
+
+    def render(self, fp, top_text, bottom_text, font_path, size, quality):
+        if not self._pending.acquire(blocking=False):
+            raise CaptionBusy("Too many captions rendering, try again shortly")
+        try:
+            future = self.executor.submit(_render, fp, top_text, bottom_text, font_path, size, quality)
+        except BaseException:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda _: self._pending.release())
+        return future.result(timeout=self.timeout)
+
+def init_captions(app):
+    app.extensions['captions'] = CaptionRenderer(
+        app.config['CAPTION_WORKERS'], app.config['CAPTION_MAX_PENDING'], app.config['CAPTION_TIMEOUT']
+    )
+
+# Render captions onto an uploaded image part
+def caption_upload(file, top_text, bottom_text, size):
+    config = current_app.config
+    return current_app.extensions['captions'].render(
+        file.stream, top_text, bottom_text, config['CAPTION_FONT'], size, config['GENERATED_IMAGE_QUALITY']
+    )
@@ -0,0 +1,91 @@
+from flask import current_app # For the shared Redis connection
+from redis.exceptions import RedisError
+from database import db # Import the database instance
+from models import Category, Post
+
+POOL_KEY = 'explore:category:{}' # Redis set of post ids per category id
+REBUILD_BATCH_SIZE = 5000
+
+# Process-wide name -> id cache, the category dictionary is tiny and append-only
+_category_ids = {}
+
+def get_redis():
+    return current_app.config['SESSION_REDIS']
+
+def normalize_category(name):
+    return name.strip().lower() if name else None
+
+# Look up (or create) the small integer id for a category name
+def get_category_id(name, create=False):
+    name = normalize_category(name)
+    if not name:
+        return None
+    if name in _category_ids:
+        return _category_ids[name]
+
+    category = Category.query.filter_by(name=name).first()
+    if category is None:
+        if not create:
+            return None
+        category = Category(name=name)
+        db.session.add(category)
+        db.session.flush()
+        return category.id # Not cached until a later lookup sees it committed
+    _category_ids[name] = category.id
+    return category.id
+
+# Incrementally add a newly committed post to its category pool
+def add_post_to_pool(post):
+    if post.category_id is None:
+        return
+    try:
+        get_redis().sadd(POOL_KEY.format(post.category_id), post.id)
+    except RedisError as e:
+        print(f"Failed to update category pool: {e}")
+
+# Sample up to k random post ids from a category pool in O(k)
+# Returns (post_ids, pool_size) or None when the pool is unavailable
+def sample_pool(category_id, k):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        pipe.srandmember(POOL_KEY.format(category_id), k)
+        pipe.scard(POOL_KEY.format(category_id))
+        members, size = pipe.execute()
+    except RedisError as e:
+        print(f"Failed to sample category pool: {e}")
+        return None
+    if not size:
+        return None
+    return [member.decode('utf-8') if isinstance(member, bytes) else member for member in members], size
+
+# Rebuild every pool from the posts table, run periodically or after a Redis flush
+def rebuild_pools():
+    redis_client = get_redis()
+    for category in Category.query.all():
+        key = POOL_KEY.format(category.id)
+        staging_key = f"{key}:rebuild"
+        redis_client.delete(staging_key)
+        last_id = ''
+        while True:
+            ids = [row.id for row in (
+                db.session.query(Post.id)
+                .filter(Post.category_id == category.id, Post.id > last_id)
+                .order_by(Post.id)
+                .limit(REBUILD_BATCH_SIZE)
+            )]
+            if not ids:
+                break
+            redis_client.sadd(staging_key, *ids)
+            last_id = ids[-1]
+        if redis_client.exists(staging_key):
+            redis_client.rename(staging_key, key) # Swap in atomically so readers never see a partial pool
+        else:
+            redis_client.delete(key)
+
+# Backfill category_id for posts created before the category dictionary existed
+def backfill_category_ids():
+    names = [row.category for row in db.session.query(Post.category).filter(Post.category_id.is_(None), Post.category.isnot(None)).distinct()]
+    for name in names:
+        category_id = get_category_id(name, create=True)
+        Post.query.filter(Post.category == name, Post.category_id.is_(None)).update({Post.category_id: category_id}, synchronize_session=False)
+    db.session.commit()
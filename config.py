@@ -13,12 +13,50 @@ class ApplicationConfig:
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URI') # Database URI (SQLite)
     engine = create_engine(SQLALCHEMY_DATABASE_URI, connect_args={'connect_timeout': 15})  # Example: 15 seconds timeout
     GOOGLE_CLOUD_STORAGE_BUCKET = os.getenv('GOOGLE_CLOUD_STORAGE_BUCKET')
+    STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'gcs') # 'gcs' bucket or 'local' directory for uploaded media
+    LOCAL_STORAGE_ROOT = os.getenv('LOCAL_STORAGE_ROOT', UPLOAD_FOLDER) # Local backend directory, served by /uploads
+    LOCAL_STORAGE_URL = os.getenv('LOCAL_STORAGE_URL', '/uploads') # URL prefix stored for local objects
     GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
     GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
     os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
     SESSION_TYPE = "redis" # Use Radis for session Storage
     SESSION_PERMANENT = False # Sessions not permanent by default 
     SESSION_USE_SIGNER = True # Sign session data for security 
+    SESSION_SERIALIZATION_FORMAT = 'msgpack' # Compact msgspec encoding instead of pickle
+    SESSION_REFRESH_EACH_REQUEST = False # Only write the session back to Redis when it changed
+    SESSION_CACHE_TTL = int(os.getenv('SESSION_CACHE_TTL', '10')) # Seconds a verified session stays in the in-process cache
+    SESSION_CACHE_SIZE = 10000 # Sessions cached per worker
+    TOKEN_AUTH_ENABLED = os.getenv('TOKEN_AUTH_ENABLED', 'false').lower() == 'true' # Accept Authorization: Bearer access tokens
+    ACCESS_TOKEN_TTL = int(os.getenv('ACCESS_TOKEN_TTL', '900')) # Seconds an access token is valid
+    REFRESH_TOKEN_TTL = int(os.getenv('REFRESH_TOKEN_TTL', str(30 * 24 * 3600))) # Seconds a refresh token is valid
+    USER_CARD_TTL = int(os.getenv('USER_CARD_TTL', '60')) # Seconds a cached username/profile picture is served
+    USER_CARD_CACHE_SIZE = 50000 # Author cards cached per worker
+    REALTIME_BROKER = os.getenv('REALTIME_BROKER', 'redis') # 'redis' pub/sub across workers, 'local' for a single process
+    TIMELINE_FANOUT_LIMIT = int(os.getenv('TIMELINE_FANOUT_LIMIT', '10000')) # Followers above which posts are merged on read
+    POLL_STREAM_INTERVAL = float(os.getenv('POLL_STREAM_INTERVAL', '1.0')) # Seconds between coalesced poll updates
+    UPLOAD_URL_TTL = int(os.getenv('UPLOAD_URL_TTL', '900')) # Seconds a signed direct-upload URL is valid
+    MAX_IMAGE_UPLOAD_SIZE = int(os.getenv('MAX_IMAGE_UPLOAD_SIZE', str(20 * 1024 * 1024))) # Bytes per image upload
+    MAX_VIDEO_UPLOAD_SIZE = int(os.getenv('MAX_VIDEO_UPLOAD_SIZE', str(500 * 1024 * 1024))) # Bytes per video upload
+    MAX_CONTENT_LENGTH = MAX_VIDEO_UPLOAD_SIZE + 1024 * 1024 # Whole request body, rejected from Content-Length before reading
+    UPLOAD_SPOOL_THRESHOLD = int(os.getenv('UPLOAD_SPOOL_THRESHOLD', str(1024 * 1024))) # File parts above this spill to a temp file
+    MEDIA_GC_GRACE = int(os.getenv('MEDIA_GC_GRACE', '86400')) # Seconds an unreferenced media object is kept before deletion
+    PHASH_MAX_DISTANCE = int(os.getenv('PHASH_MAX_DISTANCE', '6')) # Differing dHash bits still counted as the same image
+    MEDIA_SENDFILE = os.getenv('MEDIA_SENDFILE', '') # '' serves /uploads from Python, or 'x-accel-redirect' / 'x-sendfile' to offload to the proxy
+    MEDIA_ACCEL_PREFIX = os.getenv('MEDIA_ACCEL_PREFIX', '/protected-uploads') # nginx internal location aliased to UPLOAD_FOLDER
+    MEDIA_MAX_AGE = int(os.getenv('MEDIA_MAX_AGE', '3600')) # Seconds clients may cache media before revalidating
+    AI_MAX_CONCURRENCY = int(os.getenv('AI_MAX_CONCURRENCY', '8')) # OpenAI calls in flight per worker, also the connection pool size
+    AI_MAX_PER_USER = int(os.getenv('AI_MAX_PER_USER', '2')) # OpenAI calls in flight per user per worker
+    AI_QUEUE_TIMEOUT = float(os.getenv('AI_QUEUE_TIMEOUT', '5')) # Seconds a request waits for a free call slot before a 503
+    AI_BREAKER_THRESHOLD = int(os.getenv('AI_BREAKER_THRESHOLD', '5')) # Consecutive upstream failures that open the circuit breaker
+    AI_BREAKER_COOLDOWN = float(os.getenv('AI_BREAKER_COOLDOWN', '30')) # Seconds the breaker fails fast before a trial call
+    GENERATED_IMAGE_WORKERS = int(os.getenv('GENERATED_IMAGE_WORKERS', '4')) # Threads per worker re-encoding and storing DALL-E images
+    GENERATED_IMAGE_QUALITY = int(os.getenv('GENERATED_IMAGE_QUALITY', '85')) # WebP quality for stored DALL-E images
+    GENERATED_IMAGE_TIMEOUT = float(os.getenv('GENERATED_IMAGE_TIMEOUT', '30')) # Seconds a request waits for its image to be stored
+    GENERATED_IMAGE_TTL = int(os.getenv('GENERATED_IMAGE_TTL', str(30 * 24 * 3600))) # Seconds a generated image URL stays valid if never posted
+    CAPTION_FONT = os.getenv('CAPTION_FONT') # TrueType font file for captions, Pillow's bundled font when unset
+    CAPTION_WORKERS = int(os.getenv('CAPTION_WORKERS', '2')) # Threads per worker compositing captions
+    CAPTION_MAX_PENDING = int(os.getenv('CAPTION_MAX_PENDING', '16')) # Captions queued or rendering per worker before a 503
+    CAPTION_TIMEOUT = float(os.getenv('CAPTION_TIMEOUT', '10')) # Seconds a request waits for its caption render
     
     try:
         SESSION_REDIS = redis.from_url('redis://127.0.0.1:6379')
@@ -0,0 +1,35 @@
+from sqlalchemy import select, func, case, or_
+from database import db # Import the database instance
+from models import Post, Comment, Like, Poll, PollVote
+
+# Recompute the counter caches from their source tables, only touching rows that drifted
+def reconcile_counters():
+    actual_comments = (
+        select(func.count(Comment.id))
+        .where(Comment.post_id == Post.id)
+        .scalar_subquery()
+    )
+    actual_likes = (
+        select(func.coalesce(func.sum(case((Like.is_like, 1), else_=-1)), 0))
+        .where(Like.post_id == Post.id)
+        .scalar_subquery()
+    )
+    posts_fixed = (
+        Post.query
+        .filter(or_(Post.comment_count != actual_comments, Post.like_count != actual_likes))
+        .update({Post.comment_count: actual_comments, Post.like_count: actual_likes}, synchronize_session=False)
+    )
+
+    actual_votes = (
+        select(func.count(PollVote.id))
+        .where(PollVote.poll_id == Poll.id)
+        .scalar_subquery()
+    )
+    polls_fixed = (
+        Poll.query
+        .filter(Poll.total_votes != actual_votes)
+        .update({Poll.total_votes: actual_votes}, synchronize_session=False)
+    )
+
+    db.session.commit()
+    return posts_fixed, polls_fixed
@@ -0,0 +1,147 @@
+import json
+import uuid # Server-chosen object names
+from datetime import timedelta
+from flask import current_app # For config and the shared Redis connection
+from storage import emulator_host
+
+PENDING_KEY = 'uploads:pending:{}' # Redis key per issued upload id
+PENDING_TTL = 24 * 60 * 60 # Resumable sessions outlive the signed start URL, so keep the record a day
+SNIFF_BYTES = 16 # Enough of the object to recognise the file signature
+
+# Content types accepted for direct uploads and the extension their objects get
+UPLOAD_TYPES = {
+    'image/jpeg': 'jpg',
+    'image/png': 'png',
+    'image/webp': 'webp',
+    'video/mp4': 'mp4',
+    'video/quicktime': 'mov'
+}
+PURPOSES = ('post', 'profile')
+
+class UploadError(Exception):
+    pass
+
+def get_redis():
+    return current_app.config['SESSION_REDIS']
+
+# Largest object accepted for a content type
+def max_upload_size(content_type):
+    if content_type.startswith('image/'):
+        return current_app.config['MAX_IMAGE_UPLOAD_SIZE']
+    return current_app.config['MAX_VIDEO_UPLOAD_SIZE']
+
+# Content type from the file signature, the declared Content-Type is only the client's word
+def sniff_content_type(head):
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:8] == b'ftyp':
+        return 'video/quicktime' if head[8:12] == b'qt  ' else 'video/mp4'
+    if head[4:8] in (b'moov', b'mdat', b'wide', b'free'):
+        return 'video/quicktime'
+    return None
+
+def types_match(declared, sniffed):
+    if sniffed is None:
+        return False
+    if declared.startswith('video/'):
+        return sniffed.startswith('video/') # Phones label mp4 and mov containers loosely
+    return declared == sniffed
+
+# Validate the step one request body, returns an error message or None
+def validate_upload_request(purpose, content_type, size, md5_hash):
+    if purpose not in PURPOSES:
+        return "purpose must be post or profile"
+    if content_type not in UPLOAD_TYPES:
+        return f"content_type must be one of {', '.join(UPLOAD_TYPES)}"
+    if purpose == 'profile' and not content_type.startswith('image/'):
+        return "Profile pictures must be images"
+    if not isinstance(size, int) or size <= 0:
+        return "size must be a positive number of bytes"
+    if size > max_upload_size(content_type):
+        return f"{content_type} uploads are limited to {max_upload_size(content_type)} bytes"
+    if not isinstance(md5_hash, str) or not md5_hash:
+        return "md5_hash (base64 MD5 of the file) is required"
+    return None
+
+# Step one: reserve an object name and return where the client sends the bytes.
+# Against real GCS that is a V4 signed URL the client POSTs (x-goog-resumable: start) to open a
+# resumable session; the emulator does not check signatures, so the session is opened here instead.
+def start_upload(bucket, user_id, purpose, content_type, size, md5_hash):
+    upload_id = uuid.uuid4().hex
+    object_name = f"uploads/{user_id}/{upload_id}.{UPLOAD_TYPES[content_type]}"
+    blob = bucket.blob(object_name)
+    ttl = current_app.config['UPLOAD_URL_TTL']
+
+    if emulator_host():
+        target = {
+            'method': 'PUT',
+            'url': blob.create_resumable_upload_session(content_type=content_type, size=size),
+            'headers': {'Content-Type': content_type}
+        }
+    else:
+        headers = {
+            'x-goog-resumable': 'start',
+            'x-goog-content-length-range': f"0,{max_upload_size(content_type)}"
+        }
+        url = blob.generate_signed_url(
+            version='v4',
+            expiration=timedelta(seconds=ttl),
+            method='POST',
+            content_type=content_type,
+            headers=headers
+        )
+        target = {'method': 'POST', 'url': url, 'headers': {**headers, 'Content-Type': content_type}}
+
+    pending = {
+        'user_id': user_id,
+        'purpose': purpose,
+        'object_name': object_name,
+        'content_type': content_type,
+        'size': size,
+        'md5_hash': md5_hash
+    }
+    get_redis().set(PENDING_KEY.format(upload_id), json.dumps(pending), ex=PENDING_TTL)
+    return {'upload_id': upload_id, 'object_name': object_name, 'expires_in': ttl, **target}
+
+# Take ownership of a pending upload exactly once, None if unknown or someone else's
+def claim_upload(upload_id, user_id):
+    key = PENDING_KEY.format(upload_id)
+    raw = get_redis().get(key)
+    if raw is None:
+        return None
+    pending = json.loads(raw)
+    if pending['user_id'] != user_id or get_redis().delete(key) != 1:
+        return None # A concurrent finalize already claimed it
+    return pending
+
+# Put a claimed upload back so the client can retry finalize after a server-side failure
+def release_upload(upload_id, pending):
+    get_redis().set(PENDING_KEY.format(upload_id), json.dumps(pending), ex=PENDING_TTL)
+
+# Step two: check the stored object against what was declared, deleting it if it does not match.
+# Returns None while the client has not finished uploading.
+def verify_upload(bucket, pending):
+    blob = bucket.get_blob(pending['object_name'])
+    if blob is None:
+        return None
+    problem = _find_problem(blob, pending)
+    if problem:
+        blob.delete()
+        raise UploadError(problem)
+    return blob
+
+def _find_problem(blob, pending):
+    if blob.size != pending['size'] or blob.size > max_upload_size(pending['content_type']):
+        return "Uploaded size does not match"
+    if blob.content_type != pending['content_type']:
+        return "Uploaded content type does not match"
+    if blob.md5_hash != pending['md5_hash']:
+        return "Uploaded content hash does not match"
+    head = blob.download_as_bytes(start=0, end=SNIFF_BYTES - 1)
+    if not types_match(pending['content_type'], sniff_content_type(head)):
+        return f"Uploaded bytes are not {pending['content_type']}"
+    return None
@@ -0,0 +1,52 @@
+import base64
+import hashlib
+import io
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app # For config and the storage backend
+from PIL import Image
+from database import db # Import the database instance
+from media import store_media, release_media, pin_media
+from storage import get_storage
+
+# DALL-E results are requested as base64 PNGs (response_format='b64_json'), so nothing is fetched back from
+# OpenAI. They are re-encoded to WebP and stored content-addressed like uploads, which gives a cacheable URL
+# of our own and lets a later post of the same image reference the stored bytes. Nothing references an image
+# until it is posted, so it is pinned for GENERATED_IMAGE_TTL: the returned URL works at least that long,
+# and for as long as any post uses the image. Decoding and encoding a 1024x1024 image is CPU bound, so it
+# runs on a small per-process pool instead of on every request thread that happens to be generating at once.
+
+def init_generated_media(app):
+    # Threads start on first use, so a preloading server forks before any exist
+    app.extensions['generated_media'] = ThreadPoolExecutor(
+        max_workers=app.config['GENERATED_IMAGE_WORKERS'], thread_name_prefix='generated-media'
+    )
+
+def encode_webp(image_bytes, quality):
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+        encoded = io.BytesIO()
+        image.save(encoded, 'WEBP', quality=quality, method=4)
+    return encoded.getvalue()
+
+def _persist(app, b64_image):
+    with app.app_context():
+        data = encode_webp(base64.b64decode(b64_image), app.config['GENERATED_IMAGE_QUALITY'])
+        sha256 = hashlib.sha256(data).hexdigest()
+        try:
+            url = store_media(get_storage(), io.BytesIO(data), sha256, 'webp', 'image/webp', len(data))
+            # No reference is held for the caller, the pin keeps the object until posts take theirs
+            release_media(sha256)
+            pin_media(sha256, datetime.now(timezone.utc) + timedelta(seconds=app.config['GENERATED_IMAGE_TTL']))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return url
+
+# Store a b64_json image from the pool and wait for its stable URL. Raises if storing fails or times out.
+def persist_generated_image(b64_image):
+    app = current_app._get_current_object()
+    future = app.extensions['generated_media'].submit(_persist, app, b64_image)
+    return future.result(timeout=app.config['GENERATED_IMAGE_TIMEOUT'])
@@ -0,0 +1,134 @@
+import threading # Metrics are shared by every request thread in the worker
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+from flask import Response, g, has_app_context, request
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Histogram buckets in seconds, Prometheus client defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+COMPONENTS = ('db', 'session', 'gcs', 'disk', 'ai_queue', 'openai', 'json')
+
+# Per-worker Prometheus style histograms keyed by label tuple
+class Histogram:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(BUCKETS) + 1), 0.0]
+            series[0][bisect_left(BUCKETS, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                label_text = ','.join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), counts):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+                lines.append(f"{self.name}_sum{{{label_text}}} {total}")
+                lines.append(f"{self.name}_count{{{label_text}}} {cumulative}")
+        return '\n'.join(lines)
+
+request_duration = Histogram('http_request_duration_seconds', 'Request latency by Flask endpoint', ('endpoint', 'method'))
+component_duration = Histogram('http_request_component_seconds', 'Time spent per component within a request', ('endpoint', 'component'))
+ai_queue_wait = Histogram('ai_gateway_queue_wait_seconds', 'Time waiting for an OpenAI call slot', ('operation', 'outcome'))
+
+def _add_timing(component, seconds):
+    if has_app_context() and 'timings' in g:
+        g.timings[component] += seconds
+
+# Time a block of work against the current request, e.g. with timed('gcs'): ...
+@contextmanager
+def timed(component):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add_timing(component, time.perf_counter() - started)
+
+# DB time from every engine, measured around each cursor execute. The start time lives on the
+# execution context rather than the pooled connection, so a statement that raises leaves nothing behind.
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context.query_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'query_started', None)
+    if started is not None:
+        _add_timing('db', time.perf_counter() - started)
+
+# JSON provider that books serialization time to the 'json' component
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with timed('json'):
+            return super().dumps(obj, **kwargs)
+
+# Wrap the session interface so Redis session loads and saves are timed
+def _wrap_session_interface(interface):
+    open_session = interface.open_session
+    save_session = interface.save_session
+
+    def timed_open_session(app, request):
+        # Session loading runs before before_request, so the request clock starts here
+        g.request_started = time.perf_counter()
+        g.timings = defaultdict(float)
+        with timed('session'):
+            return open_session(app, request)
+
+    def timed_save_session(app, session, response):
+        with timed('session'):
+            return save_session(app, session, response)
+
+    interface.open_session = timed_open_session
+    interface.save_session = timed_save_session
+
+def init_instrumentation(app):
+    app.json = TimedJSONProvider(app)
+    _wrap_session_interface(app.session_interface)
+
+    @app.before_request
+    def start_request_timer():
+        if 'request_started' not in g:
+            g.request_started = time.perf_counter()
+            g.timings = defaultdict(float)
+
+    @app.after_request
+    def add_server_timing(response):
+        if 'request_started' not in g:
+            return response
+        total = time.perf_counter() - g.request_started
+        metrics = [f"{component};dur={g.timings[component] * 1000:.1f}" for component in COMPONENTS if component in g.timings]
+        metrics.append(f"total;dur={total * 1000:.1f}")
+        response.headers['Server-Timing'] = ', '.join(metrics)
+        return response
+
+    # Observed at teardown so the session save is included
+    @app.teardown_request
+    def record_request_metrics(exc):
+        if 'request_started' not in g:
+            return
+        endpoint = request.endpoint or 'unmatched'
+        request_duration.observe((endpoint, request.method), time.perf_counter() - g.request_started)
+        for component, seconds in g.timings.items():
+            component_duration.observe((endpoint, component), seconds)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        body = '\n'.join(histogram.render() for histogram in (request_duration, component_duration, ai_queue_wait)) + '\n'
+        return Response(body, mimetype='text/plain; version=0.0.4')
+
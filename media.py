@@ -0,0 +1,108 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select, update, delete, case, exists, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from database import db # Import the database instance
+from models import Media, Post, User
+
+# Sharded by hash prefix. The random suffix means bytes re-uploaded after garbage collection
+# never land on the object name a collector run is still deleting.
+def media_object_name(sha256, extension):
+    return f"media/{sha256[:2]}/{sha256}-{uuid.uuid4().hex[:8]}.{extension}"
+
+# Take a reference on already stored bytes, returns their URL or None if nobody stored them yet
+def reference_media(sha256):
+    return db.session.execute(
+        update(Media)
+        .where(Media.sha256 == sha256, Media.ref_count >= 0)
+        .values(ref_count=Media.ref_count + 1)
+        .returning(Media.url)
+    ).scalar()
+
+# Record a freshly uploaded object holding one reference. If the same bytes were recorded
+# concurrently that row wins and its URL comes back, so the caller can drop its own copy;
+# a row being garbage collected is taken over by the new object instead.
+def record_media(sha256, object_name, url, content_type, size):
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    stmt = dialect.insert(Media).values(
+        sha256=sha256, object_name=object_name, url=url, content_type=content_type, size=size, ref_count=1
+    )
+    collecting = Media.ref_count < 0
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Media.sha256],
+        set_={
+            'ref_count': case((collecting, 1), else_=Media.ref_count + 1),
+            'object_name': case((collecting, stmt.excluded.object_name), else_=Media.object_name),
+            'url': case((collecting, stmt.excluded.url), else_=Media.url)
+        }
+    )
+    return db.session.execute(stmt.returning(Media.url)).scalar()
+
+# Store bytes under their SHA-256 unless they already are, taking one reference either way. Returns the URL.
+# Storage errors propagate; the reference commits with the caller.
+def store_media(storage, file, sha256, extension, content_type, size):
+    url = reference_media(sha256)
+    if url:
+        return url
+
+    object_name = media_object_name(sha256, extension)
+    file_url = storage.save(file, object_name, content_type=content_type, size=size)
+    url = record_media(sha256, object_name, file_url, content_type, size)
+    if url != file_url:
+        # The same bytes were stored concurrently, keep that copy and drop ours
+        try:
+            storage.delete(object_name)
+        except Exception as e:
+            print(f"Failed to delete duplicate upload {object_name}: {e}")
+    return url
+
+# Drop a reference, the object becomes collectable once the grace period passes
+def release_media(sha256):
+    if sha256:
+        db.session.execute(
+            update(Media)
+            .where(Media.sha256 == sha256, Media.ref_count > 0)
+            .values(ref_count=Media.ref_count - 1, released_at=func.now())
+        )
+
+# Keep an object through garbage collection until `until` even if nothing references it
+def pin_media(sha256, until):
+    db.session.execute(
+        update(Media)
+        .where(Media.sha256 == sha256)
+        .values(pinned_until=case((Media.pinned_until > until, Media.pinned_until), else_=until))
+    )
+
+# Periodic job: delete objects nobody has referenced for grace_seconds and that are not pinned.
+# Rows are first marked with ref_count -1 (committed), then the objects are deleted, then the rows,
+# so an upload of the same bytes in between takes the row over rather than losing its object.
+def collect_media_garbage(storage, grace_seconds):
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+    db.session.execute(
+        update(Media)
+        .where(
+            Media.ref_count == 0,
+            Media.released_at < cutoff,
+            or_(Media.pinned_until.is_(None), Media.pinned_until < datetime.now(timezone.utc)),
+            ~exists().where(Post.media_hash == Media.sha256), # Counters can drift, the references cannot
+            ~exists().where(User.profile_media_hash == Media.sha256)
+        )
+        .values(ref_count=-1)
+    )
+    db.session.commit()
+
+    # Includes rows left marked by an earlier run that failed part way
+    collecting = db.session.execute(select(Media.sha256, Media.object_name).where(Media.ref_count == -1)).all()
+    deleted = []
+    for sha256, object_name in collecting:
+        try:
+            storage.delete(object_name) # Already-missing objects count as deleted
+        except Exception as e:
+            print(f"Error deleting media object {object_name}: {e}")
+            continue
+        deleted.append(sha256)
+
+    if deleted:
+        db.session.execute(delete(Media).where(Media.sha256.in_(deleted), Media.ref_count == -1))
+    db.session.commit()
+    return len(deleted)
@@ -0,0 +1,60 @@
+import mimetypes
+import os
+from flask import Response, abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+# Strong validator from size and nanosecond mtime, so a rewrite within the same second still changes it
+def media_etag(stat):
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+# Serve a file under directory with byte ranges and ETag revalidation.
+# MEDIA_SENDFILE hands the bytes to the front proxy instead of copying them through the worker:
+#   'x-accel-redirect' - nginx internal location at MEDIA_ACCEL_PREFIX mapped onto directory
+#   'x-sendfile'       - Apache mod_xsendfile / lighttpd with the absolute path
+def send_media(directory, filename):
+    path = safe_join(os.path.join(current_app.root_path, directory), filename) # Relative to the app like send_from_directory
+    if path is None or any(part.startswith('.') for part in filename.split('/')): # Hidden files, e.g. in-flight temp files
+        abort(404)
+    try:
+        stat = os.stat(path)
+    except OSError:
+        abort(404)
+    if not os.path.isfile(path):
+        abort(404)
+
+    mode = current_app.config['MEDIA_SENDFILE']
+    max_age = current_app.config['MEDIA_MAX_AGE']
+    if not mode:
+        # Range, If-Range, If-None-Match and If-Modified-Since are all answered by send_file
+        response = send_file(path, conditional=True, etag=media_etag(stat), last_modified=stat.st_mtime, max_age=max_age)
+        response.headers.setdefault('Accept-Ranges', 'bytes') # Werkzeug only sets it on 206s, players look for it on the first 200
+        if response.status_code == 206:
+            _send_range_with_file_wrapper(response, path)
+        return response
+
+    response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+    if mode == 'x-accel-redirect':
+        response.headers['X-Accel-Redirect'] = f"{current_app.config['MEDIA_ACCEL_PREFIX'].rstrip('/')}/{filename}"
+    else:
+        response.headers['X-Sendfile'] = path
+    response.set_etag(media_etag(stat))
+    response.last_modified = stat.st_mtime
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    response.headers['Accept-Ranges'] = 'bytes' # The proxy slices ranges from the file itself
+    return response.make_conditional(request) # Revalidations still end here with a 304
+
+# Werkzeug slices 206 bodies with a Python iterator, which hides the file from the server. gunicorn's
+# wsgi.file_wrapper sends from the file's current offset for Content-Length bytes, so hand it the file
+# positioned at the range start instead and the slice never enters Python. PEP 3333 does not promise that
+# offset is honoured (uWSGI's sendfile path may start at 0), so any other server keeps Werkzeug's iterator.
+OFFSET_FILE_WRAPPERS = ('gunicorn.',) # Modules of file wrappers known to start at the current offset
+
+def _send_range_with_file_wrapper(response, path):
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    if file_wrapper is None or not getattr(file_wrapper, '__module__', '').startswith(OFFSET_FILE_WRAPPERS):
+        return
+    media = open(path, 'rb')
+    media.seek(response.content_range.start)
+    response.response.close()
+    response.response = file_wrapper(media)
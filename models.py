@@ -1,48 +1,106 @@
 from flask_sqlalchemy import SQLAlchemy # Import SQLAlchemy for database Interaction
 from uuid import uuid4  # Import the uuid module for generating unique IDs
+from datetime import datetime, timezone
 from database import db # Import the database instance from your database
 from sqlalchemy.sql import func # import for timestamp
+from sqlalchemy.orm import deferred # Heavy/sensitive columns load only when touched
 from flask_migrate import Migrate
 # Function to generate a unqiue hexidecimal ID 
 def get_uuid():
     return uuid4().hex 
+# Insert time with microseconds for columns keyset cursors page over. SQLite's CURRENT_TIMESTAMP only
+# keeps whole seconds, so rows written in the same second would tie and compare against cursors in a
+# different string format.
+def utcnow():
+    return datetime.now(timezone.utc)
+# SQLite hands back naive UTC timestamps, PostgreSQL aware ones
+def as_utc(timestamp):
+    return timestamp.replace(tzinfo=timezone.utc) if timestamp.tzinfo is None else timestamp
 saved_posts_table = db.Table('saved_posts', 
-    db.Column('user_id', db.String(32), db.ForeignKey('users.id')),
-    db.Column('post_id', db.String(32), db.ForeignKey('posts.id')),
+    db.Column('user_id', db.String(32), db.ForeignKey('users.id'), primary_key=True),
+    db.Column('post_id', db.String(32), db.ForeignKey('posts.id'), primary_key=True),
+    db.Column('saved_at', db.DateTime(timezone=True), nullable=False, default=utcnow, server_default=func.now()), # When the post was bookmarked
+    db.Index('ix_saved_posts_user_saved_at', 'user_id', 'saved_at'), # Serves the per-user saved feed in save order
  )
 # User Model representing the structor of the "Users" table and attributes 
 class User(db.Model):
     __tablename__ = "users" # Specify the table name 
     id = db.Column(db.String(32), primary_key=True, unique=True, default=get_uuid) # Primary key, uses UUID for ID generation
-    email = db.Column(db.String(345), unique=True) # Unique email column
-    password = db.Column(db.Text, nullable=False) # Non-nullable password column
+    email = deferred(db.Column(db.String(345), unique=True)) # Unique email column
+    password = deferred(db.Column(db.Text, nullable=False)) # Non-nullable password column
     profile_picture = db.Column(db.String(255)) # Store profile picture URL
     username = db.Column(db.String(50), unique=True, nullable=False) # Unique username 
     saved_posts = db.relationship('Post', secondary=saved_posts_table, backref="saved")
+    follower_count = db.Column(db.Integer, nullable=False, default=0, server_default='0') # Counter cache, also picks fan-out strategy
+    following_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    profile_media_hash = db.Column(db.String(64), db.ForeignKey('media.sha256'), index=True) # Media row behind profile_picture, if deduplicated
+
+# Follow edge: follower_id follows followed_id
+class Follow(db.Model):
+    __tablename__ = "follows"
+    __table_args__ = (db.Index('ix_follows_followed', 'followed_id', 'follower_id'),) # Follower lookups for fan-out
+    follower_id = db.Column(db.String(32), db.ForeignKey('users.id'), primary_key=True)
+    followed_id = db.Column(db.String(32), db.ForeignKey('users.id'), primary_key=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=func.now())
+# Category dictionary mapping free-text post categories to small integer ids
+class Category(db.Model):
+    __tablename__ = "categories"
+    id = db.Column(db.SmallInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True) # SQLite only autoincrements INTEGER keys
+    name = db.Column(db.String(50), unique=True, nullable=False)
+
+# Content-addressed media: one stored object per distinct SHA-256, shared by every post/profile that uploads it
+class Media(db.Model):
+    __tablename__ = "media"
+    __table_args__ = (db.Index('ix_media_gc', 'ref_count', 'released_at'),) # Garbage collection scans
+    sha256 = db.Column(db.String(64), primary_key=True)
+    object_name = db.Column(db.String(255), nullable=False)
+    url = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(50))
+    size = db.Column(db.BigInteger, nullable=False)
+    ref_count = db.Column(db.Integer, nullable=False, default=1, server_default='1') # -1 while garbage collection deletes the object
+    created_at = db.Column(db.DateTime(timezone=True), default=func.now())
+    released_at = db.Column(db.DateTime(timezone=True)) # Last time a reference was dropped
+    pinned_until = db.Column(db.DateTime(timezone=True)) # Kept past garbage collection until then even without references
+
 # Post Model representing users posts
 class Post(db.Model):
     __tablename__ = "posts" # Specifies table name
+    __table_args__ = (
+        db.Index('ix_posts_user_timestamp', 'user_id', 'timestamp'), # Per-author recency scans for timelines
+        db.Index('ix_posts_hot_score', 'hot_score', 'id'), # Ranked explore range scans
+        db.Index('ix_posts_category_hot_score', 'category_id', 'hot_score', 'id'), # Ranked explore within a category
+    )
     id = db.Column(db.String(32), primary_key=True, unique=True, default=get_uuid) # Independent post id - Primary key
     user_id = db.Column(db.String(32), db.ForeignKey('users.id'), nullable=False) # Gets the foreign key for the table which is user_id
     content_type = db.Column(db.String(10), nullable=False) # Image or Video have to program with setTimeout in React to make it so holding camera inputs Video and clicking is Image
     content_url = db.Column(db.String(255), nullable=False) # URL to store content
-    timestamp = db.Column(db.DateTime(timezone=True), default=func.now())
+    timestamp = db.Column(db.DateTime(timezone=True), default=utcnow)
     category = db.Column(db.String)
+    category_id = db.Column(db.SmallInteger, db.ForeignKey('categories.id'), index=True) # Normalized category for explore filtering
     like_count = db.Column(db.Integer, nullable=False, default=0) # New like_count
+    comment_count = db.Column(db.Integer, nullable=False, default=0, server_default='0') # Counter cache maintained by create_comments
+    hot_score = db.Column(db.Float, nullable=False, default=0, server_default='0') # Decayed engagement score, refreshed by a batch job
+    media_hash = db.Column(db.String(64), db.ForeignKey('media.sha256'), index=True) # Media row behind content_url, if deduplicated
+    phash = db.Column(db.BigInteger) # Signed 64-bit dHash of images, indexed for near-duplicate lookups in Redis
     user = db.relationship("User", backref="posts")
     
 
 class Comment(db.Model):
     __tablename__ = "comments"
+    __table_args__ = (db.Index('ix_comments_post_timestamp', 'post_id', 'timestamp', 'id'),) # Thread reads and resume cursors
     id = db.Column(db.String(32), primary_key=True, unique=True, default=get_uuid)
     post_id = db.Column(db.String(32), db.ForeignKey('posts.id'), nullable=False)
     user_id = db.Column(db.String(32), db.ForeignKey('users.id'), nullable=False)
     text = db.Column(db.Text, nullable=False)
-    timestamp = db.Column(db.DateTime(timezone=True), default=func.now())
+    timestamp = db.Column(db.DateTime(timezone=True), default=utcnow)
     post = db.relationship("Post", backref="comments")
     user = db.relationship("User", backref="comments")
 
 class Like(db.Model):
+    # One reaction per user and post, reactions are written as upserts on this key
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'post_id', name='uq_like_user_post'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.String(32), db.ForeignKey('users.id'), nullable=False)
     post_id = db.Column(db.String(32), db.ForeignKey('posts.id'), nullable=False)
@@ -55,6 +113,7 @@ class Poll(db.Model):
     id = db.Column(db.String(32), primary_key=True, default=get_uuid)
     title = db.Column(db.String(255), nullable=False)
     user_id = db.Column(db.String(32), db.ForeignKey('users.id'), nullable=False)
+    total_votes = db.Column(db.Integer, nullable=False, default=0, server_default='0') # Counter cache maintained by vote_poll
     options = db.relationship('PollOption', backref='poll', lazy=True, cascade="all, delete-orphan")
     user = db.relationship('User', backref='polls')  # Add this line to define the relationship
 # Poll Option model
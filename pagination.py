@@ -0,0 +1,49 @@
+import base64 # For opaque cursor encoding
+from datetime import datetime # For parsing timestamp cursors
+from sqlalchemy import text
+from database import db # Import the database instance
+
+# Cursors are "<iso timestamp>|<id>" pairs, base64 encoded so clients treat them as opaque
+def encode_cursor(timestamp, row_id):
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+# Returns (timestamp, id) or None when the cursor is missing or malformed
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        timestamp, row_id = raw.split('|', 1)
+        return datetime.fromisoformat(timestamp), row_id
+    except (ValueError, UnicodeError):
+        return None
+
+# Score cursors are "<float score>|<id>" pairs for ranked feeds
+def encode_score_cursor(score, row_id):
+    raw = f"{score!r}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_score_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        score, row_id = raw.split('|', 1)
+        return float(score), row_id
+    except (ValueError, UnicodeError):
+        return None
+
+# SQLite keeps CURRENT_TIMESTAMP defaults as whole seconds ('YYYY-MM-DD HH:MM:SS') while timestamp cursors
+# bind with a fraction ('... HH:MM:SS.000000'). Both compare as strings, so such a row sorts before its own
+# cursor and the page after it starts with the same rows again. Pads them to the bound format once;
+# returns the number of rows changed (always 0 on other databases).
+def normalize_sqlite_timestamps(columns):
+    if db.engine.dialect.name != 'sqlite':
+        return 0
+    changed = 0
+    for column in columns:
+        table, name = column.table.name, column.name
+        changed += db.session.execute(text(f"UPDATE {table} SET {name} = {name} || '.000000' WHERE length({name}) = 19")).rowcount
+    db.session.commit()
+    return changed
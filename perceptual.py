@@ -0,0 +1,160 @@
+from itertools import combinations
+from flask import current_app # For the shared Redis connection
+from PIL import Image
+from redis.exceptions import RedisError
+from database import db # Import the database instance
+from models import Post
+
+# 64-bit dHash, indexed by multi-index hashing: the hash is split into CHUNKS 16-bit chunks and
+# each chunk value is a Redis set of the full hashes containing it. Two hashes within distance d
+# differ in at most d // CHUNKS bits of some chunk, so probing every chunk value within that
+# radius finds all of them.
+HASH_BITS = 64
+CHUNKS = 4
+CHUNK_BITS = HASH_BITS // CHUNKS
+CHUNK_KEY = 'phash:chunk:{}:{:04x}' # Set of 16-hex-digit hashes per chunk position and value
+POSTS_KEY = 'phash:posts' # Hash: 16-hex-digit hash -> first post id that had it
+REBUILD_BATCH_SIZE = 5000
+
+def get_redis():
+    return current_app.config['SESSION_REDIS']
+
+# Difference hash: shrink to 9x8 greyscale and record whether each pixel is darker than its right neighbour
+def dhash(fp):
+    with Image.open(fp) as image:
+        image.draft('L', (36, 32)) # JPEG decodes straight to a small greyscale image
+        pixels = image.convert('L').resize((9, 8), Image.Resampling.LANCZOS).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] < pixels[row * 9 + col + 1])
+    return value
+
+# Signed dHash of an uploaded image part (None for videos or unreadable images), rewound for the upload
+def hash_upload(file):
+    if not file.mimetype.startswith('image/'):
+        return None
+    try:
+        return to_signed(dhash(file.stream))
+    except Exception as e:
+        print(f"Failed to hash upload: {e}")
+        return None
+    finally:
+        file.stream.seek(0)
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+# Post.phash is a signed BIGINT, hashes are unsigned 64-bit
+def to_signed(value):
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+def to_unsigned(value):
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+def chunk_values(value):
+    mask = (1 << CHUNK_BITS) - 1
+    return [(value >> (CHUNK_BITS * i)) & mask for i in range(CHUNKS)]
+
+# Every chunk key that can hold a hash within max_distance of value
+def probe_keys(value, max_distance):
+    radius = max_distance // CHUNKS
+    keys = []
+    for position, chunk in enumerate(chunk_values(value)):
+        for flipped in range(radius + 1):
+            for bits in combinations(range(CHUNK_BITS), flipped):
+                probe = chunk
+                for bit in bits:
+                    probe ^= 1 << bit
+                keys.append(CHUNK_KEY.format(position, probe))
+    return keys
+
+def index_hash(pipe, value, post_id):
+    member = f"{value:016x}"
+    for position, chunk in enumerate(chunk_values(value)):
+        pipe.sadd(CHUNK_KEY.format(position, chunk), member)
+    pipe.hsetnx(POSTS_KEY, member, post_id)
+
+# Add a newly committed post's hash to the index
+def index_post(post):
+    if post.phash is None:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        index_hash(pipe, to_unsigned(post.phash), post.id)
+        pipe.execute()
+    except RedisError as e:
+        print(f"Failed to update perceptual hash index: {e}")
+
+# Indexed hashes within max_distance, as [(post_id, distance)] nearest first.
+# One pipelined round trip for the probes, a second only when something matched.
+def find_near_duplicates(value, max_distance):
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for key in probe_keys(value, max_distance):
+            pipe.smembers(key)
+        candidates = set().union(*pipe.execute())
+        matches = []
+        for member in candidates:
+            distance = hamming(value, int(member, 16))
+            if distance <= max_distance:
+                matches.append((distance, member))
+        if not matches:
+            return []
+        matches.sort()
+        post_ids = get_redis().hmget(POSTS_KEY, [member for _, member in matches])
+    except RedisError as e:
+        print(f"Failed to query perceptual hash index: {e}")
+        return []
+    return [(post_id.decode('utf-8') if isinstance(post_id, bytes) else post_id, distance)
+            for (distance, _), post_id in zip(matches, post_ids) if post_id]
+
+# Drop posts that look like an earlier post on the same page, keeping the first of each group
+def dedupe_near_duplicates(posts, max_distance):
+    kept, hashes = [], []
+    for post in posts:
+        if post.phash is not None:
+            value = to_unsigned(post.phash)
+            if any(hamming(value, seen) <= max_distance for seen in hashes):
+                continue
+            hashes.append(value)
+        kept.append(post)
+    return kept
+
+# Rebuild the index from posts.phash, run after a Redis flush
+def rebuild_index():
+    redis_client = get_redis()
+    redis_client.delete(POSTS_KEY)
+    for position in range(CHUNKS):
+        for keys in _scan_batches(redis_client, f"phash:chunk:{position}:*"):
+            redis_client.delete(*keys)
+
+    indexed = 0
+    last_id = ''
+    while True:
+        rows = (
+            db.session.query(Post.id, Post.phash)
+            .filter(Post.phash.isnot(None), Post.id > last_id)
+            .order_by(Post.id)
+            .limit(REBUILD_BATCH_SIZE)
+            .all()
+        )
+        if not rows:
+            break
+        pipe = redis_client.pipeline(transaction=False)
+        for post_id, phash in rows:
+            index_hash(pipe, to_unsigned(phash), post_id)
+        pipe.execute()
+        indexed += len(rows)
+        last_id = rows[-1].id
+    return indexed
+
+def _scan_batches(redis_client, pattern, count=1000):
+    batch = []
+    for key in redis_client.scan_iter(match=pattern, count=count):
+        batch.append(key)
+        if len(batch) >= count:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
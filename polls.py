@@ -0,0 +1,40 @@
+from sqlalchemy import insert
+from database import db # Import the database instance
+from models import Poll, PollOption, get_uuid
+
+MAX_POLL_BATCH_SIZE = 50 # Polls per /create_polls request
+MAX_POLL_OPTIONS = 20
+MAX_TEXT_LENGTH = 255 # Poll.title and PollOption.text are String(255)
+
+# Error message for an invalid {"title", "options"} poll, None if it can be created
+def validate_poll(data):
+    if not isinstance(data, dict):
+        return "Invalid poll data"
+    title = data.get('title')
+    options = data.get('options')
+    if not title or not isinstance(title, str) or not isinstance(options, list) or len(options) < 2:
+        return "Invalid poll data"
+    if len(options) > MAX_POLL_OPTIONS:
+        return f"Polls are limited to {MAX_POLL_OPTIONS} options"
+    if not all(isinstance(option, str) and option for option in options):
+        return "Poll options must be non-empty text"
+    if len(title) > MAX_TEXT_LENGTH or any(len(option) > MAX_TEXT_LENGTH for option in options):
+        return f"Poll titles and options are limited to {MAX_TEXT_LENGTH} characters"
+    if len(set(options)) != len(options):
+        return "Poll options must be unique"
+    return None
+
+# Insert validated polls and their options, returns the poll ids. Ids are generated here rather than
+# read back after a flush, so all polls go in one multi-row INSERT and all options in a second
+# (insertmanyvalues), however many there are. Commits with the caller.
+def create_polls(user_id, polls):
+    poll_rows = []
+    option_rows = []
+    for poll in polls:
+        poll_id = get_uuid()
+        poll_rows.append({'id': poll_id, 'title': poll['title'], 'user_id': user_id, 'total_votes': 0})
+        option_rows.extend({'id': get_uuid(), 'poll_id': poll_id, 'text': text, 'vote_count': 0} for text in poll['options'])
+
+    db.session.execute(insert(Poll), poll_rows)
+    db.session.execute(insert(PollOption), option_rows)
+    return [row['id'] for row in poll_rows]
@@ -0,0 +1,41 @@
+from dataclasses import dataclass # Slotted read models for read-only endpoints
+from database import db # Import the database instance
+from models import User
+
+# Public profile fields, never the password hash
+@dataclass(slots=True, frozen=True)
+class UserProfile:
+    id: str
+    email: str
+    username: str
+    profile_picture: str
+
+# What login needs to check a password and answer the client
+@dataclass(slots=True, frozen=True)
+class UserCredentials:
+    id: str
+    email: str
+    username: str
+    password: str
+
+def load_user_profile(user_id):
+    row = (
+        db.session.query(User.id, User.email, User.username, User.profile_picture)
+        .filter(User.id == user_id)
+        .first()
+    )
+    return UserProfile(*row) if row else None
+
+# Look a user up by email or username for login
+def load_credentials(identifier):
+    column = User.email if '@' in identifier else User.username
+    row = (
+        db.session.query(User.id, User.email, User.username, User.password)
+        .filter(column == identifier)
+        .first()
+    )
+    return UserCredentials(*row) if row else None
+
+# Existence check that only touches the index, e.g. user_exists(email=...)
+def user_exists(**filters):
+    return db.session.query(User.id).filter_by(**filters).first() is not None
@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import update
+from database import db # Import the database instance
+from models import Post, as_utc
+
+COMMENT_WEIGHT = 2.0 # A comment counts as much as two likes
+GRAVITY = 1.8 # How fast posts sink as they age
+RANKING_WINDOW = timedelta(days=7) # Older posts are pinned to a zero score
+REFRESH_BATCH_SIZE = 5000
+
+# Decayed hot score: (likes + weighted comments + 1) / (age in hours + 2) ^ gravity
+def hot_score(like_count, comment_count, age_hours):
+    return (like_count + COMMENT_WEIGHT * comment_count + 1) / (age_hours + 2) ** GRAVITY
+
+# Score for a post that was just created
+def initial_hot_score():
+    return hot_score(0, 0, 0)
+
+def _age_hours(now, timestamp):
+    return max((now - as_utc(timestamp)).total_seconds() / 3600, 0)
+
+# Periodic batch job: rescore every post in the ranking window.
+# Reads narrow (id, like_count, comment_count, timestamp) rows a batch at a time,
+# scores the whole batch at once and writes it back with one executemany UPDATE.
+def refresh_hot_scores(now=None):
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - RANKING_WINDOW
+    refreshed = 0
+    last_id = ''
+    while True:
+        rows = (
+            db.session.query(Post.id, Post.like_count, Post.comment_count, Post.timestamp)
+            .filter(Post.timestamp >= cutoff, Post.id > last_id)
+            .order_by(Post.id)
+            .limit(REFRESH_BATCH_SIZE)
+            .all()
+        )
+        if not rows:
+            break
+        ages = [_age_hours(now, row.timestamp) for row in rows]
+        scores = [hot_score(row.like_count, row.comment_count, age) for row, age in zip(rows, ages)]
+        db.session.execute(update(Post), [{'id': row.id, 'hot_score': score} for row, score in zip(rows, scores)])
+        db.session.commit()
+        refreshed += len(rows)
+        last_id = rows[-1].id
+
+    # Posts that aged out of the window drop to the bottom of the ranking
+    expired = (
+        Post.query
+        .filter(Post.timestamp < cutoff, Post.hot_score != 0)
+        .update({Post.hot_score: 0}, synchronize_session=False)
+    )
+    db.session.commit()
+    return refreshed, expired
@@ -0,0 +1,197 @@
+from flask import current_app # For the shared Redis connection
+from redis.exceptions import RedisError
+from sqlalchemy import select, update, delete, bindparam, case, func, literal_column, text
+from sqlalchemy.dialects import postgresql, sqlite
+from database import db # Import the database instance
+from models import Like, Post
+
+REACTIONS = {'like': True, 'dislike': False, 'clear': None} # Reaction name -> Like.is_like, None removes the row
+MAX_BATCH_SIZE = 100
+IDEMPOTENCY_KEY = 'reactions:applied:{}:{}' # Per user, so keys only have to be unique per client
+IDEMPOTENCY_TTL = 24 * 60 * 60
+
+def get_redis():
+    return current_app.config['SESSION_REDIS']
+
+# Contribution of a reaction to Post.like_count
+def reaction_weight(is_like):
+    if is_like is None:
+        return 0
+    return 1 if is_like else -1
+
+# INSERT ... ON CONFLICT (user_id, post_id) DO UPDATE for the current database,
+# optionally leaving the row alone when the reaction is unchanged
+def like_upsert(only_changes=False):
+    dialect = postgresql if db.engine.dialect.name == 'postgresql' else sqlite
+    stmt = dialect.insert(Like)
+    return stmt.on_conflict_do_update(
+        index_elements=[Like.user_id, Like.post_id],
+        set_={'is_like': stmt.excluded.is_like},
+        where=Like.is_like.is_distinct_from(stmt.excluded.is_like) if only_changes else None
+    )
+
+# Set one user's reaction on a post, keeping like_count in step.
+# Returns (changed, like_count) or None if the post does not exist.
+def set_reaction(user_id, post_id, is_like):
+    weight = reaction_weight(is_like)
+    if db.engine.dialect.name == 'postgresql':
+        # One statement: the upsert only touches the row when the reaction flips, and reports
+        # whether it inserted (xmax = 0) so the counter moves by 1 for a new row or 2 for a flip
+        upsert = (
+            like_upsert(only_changes=True)
+            .values(user_id=user_id, post_id=post_id, is_like=is_like)
+            .returning(literal_column('xmax = 0').label('inserted'))
+            .cte('upsert')
+        )
+        like_count = db.session.execute(
+            update(Post)
+            .where(Post.id == post_id, upsert.c.inserted.isnot(None))
+            .values(like_count=Post.like_count + case((upsert.c.inserted, weight), else_=2 * weight))
+            .returning(Post.like_count)
+        ).scalar()
+        # No row back means the reaction was already set; a missing post fails the foreign key instead
+        return (like_count is not None, like_count)
+
+    # SQLite has a single writer, so read-then-upsert inside the transaction cannot race
+    previous = db.session.execute(select(Like.is_like).where(Like.user_id == user_id, Like.post_id == post_id)).scalar()
+    if previous is is_like:
+        return (False, None)
+    like_count = db.session.execute(
+        update(Post)
+        .where(Post.id == post_id)
+        .values(like_count=Post.like_count + weight - reaction_weight(previous))
+        .returning(Post.like_count)
+    ).scalar()
+    if like_count is None:
+        return None
+    db.session.execute(like_upsert().values(user_id=user_id, post_id=post_id, is_like=is_like))
+    return (True, like_count)
+
+# Collapse a burst of operations to the final reaction per post, last one wins.
+# Returns the reactions to apply and the idempotency keys that were already applied.
+def coalesce_operations(user_id, operations):
+    keys = [op['idempotency_key'] for op in operations if op.get('idempotency_key')]
+    seen = _applied_keys(user_id, keys)
+
+    reactions = {}
+    for op in operations:
+        if op.get('idempotency_key') in seen:
+            continue
+        reactions.pop(op['post_id'], None) # Keep the batch order of the last write
+        reactions[op['post_id']] = REACTIONS[op['reaction']]
+    return reactions, seen
+
+def _applied_keys(user_id, keys):
+    if not keys:
+        return set()
+    try:
+        flags = get_redis().mget([IDEMPOTENCY_KEY.format(user_id, key) for key in keys])
+    except RedisError as e:
+        # Operations set a final state, so replaying one is harmless if the keys are unavailable
+        print(f"Error reading reaction idempotency keys: {e}")
+        return set()
+    return {key for key, flag in zip(keys, flags) if flag}
+
+# Remember applied keys after the transaction commits
+def mark_applied(user_id, keys):
+    if not keys:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for key in keys:
+            pipe.set(IDEMPOTENCY_KEY.format(user_id, key), 1, ex=IDEMPOTENCY_TTL)
+        pipe.execute()
+    except RedisError as e:
+        print(f"Error storing reaction idempotency keys: {e}")
+
+# Apply {post_id: is_like} for one user in the current transaction.
+# Returns the post ids that exist; the caller commits and reads the counts back.
+def apply_reactions(user_id, reactions):
+    post_ids = set(db.session.scalars(select(Post.id).where(Post.id.in_(list(reactions)))))
+    if not post_ids:
+        return post_ids
+
+    reactions = {post_id: is_like for post_id, is_like in reactions.items() if post_id in post_ids}
+    if db.engine.dialect.name == 'postgresql':
+        deltas = _write_reactions_postgresql(user_id, reactions)
+    else:
+        deltas = _write_reactions_sqlite(user_id, reactions)
+
+    deltas = [{'b_id': post_id, 'b_delta': delta} for post_id, delta in sorted(deltas.items()) if delta]
+    if deltas:
+        posts = Post.__table__
+        db.session.execute(
+            posts.update()
+            .where(posts.c.id == bindparam('b_id'))
+            .values(like_count=posts.c.like_count + bindparam('b_delta')),
+            deltas
+        )
+    return post_ids
+
+# Deltas come from what the statements actually changed, so a concurrent batch inserting the same
+# reaction (which no earlier read could have locked) is counted once: the later upsert finds the row
+# already set and returns nothing. Rows are written in post id order so concurrent batches lock alike.
+def _write_reactions_postgresql(user_id, reactions):
+    upserts = [{'user_id': user_id, 'post_id': post_id, 'is_like': is_like}
+               for post_id, is_like in sorted(reactions.items()) if is_like is not None]
+    clears = sorted(post_id for post_id, is_like in reactions.items() if is_like is None)
+
+    deltas = {}
+    if upserts:
+        # A returned row was either inserted (xmax = 0) or flipped from the opposite reaction
+        changed = db.session.execute(
+            like_upsert(only_changes=True)
+            .values(upserts)
+            .returning(Like.post_id, Like.is_like, literal_column('xmax = 0').label('inserted'))
+        )
+        for post_id, is_like, inserted in changed:
+            weight = reaction_weight(is_like)
+            deltas[post_id] = weight if inserted else 2 * weight
+    if clears:
+        removed = db.session.execute(
+            delete(Like).where(Like.user_id == user_id, Like.post_id.in_(clears)).returning(Like.post_id, Like.is_like)
+        )
+        for post_id, is_like in removed:
+            deltas[post_id] = -reaction_weight(is_like)
+    return deltas
+
+# SQLite has a single writer, so the rows read here are the rows the writes replace
+def _write_reactions_sqlite(user_id, reactions):
+    current = dict(db.session.execute(
+        select(Like.post_id, Like.is_like).where(Like.user_id == user_id, Like.post_id.in_(list(reactions)))
+    ).all())
+
+    upserts, clears, deltas = [], [], {}
+    for post_id, is_like in reactions.items():
+        if current.get(post_id) is is_like:
+            continue
+        if is_like is None:
+            clears.append(post_id)
+        else:
+            upserts.append({'user_id': user_id, 'post_id': post_id, 'is_like': is_like})
+        deltas[post_id] = reaction_weight(is_like) - reaction_weight(current.get(post_id))
+
+    if upserts:
+        db.session.execute(like_upsert(), upserts)
+    if clears:
+        db.session.execute(delete(Like).where(Like.user_id == user_id, Like.post_id.in_(clears)))
+    return deltas
+
+# Final like_count and the user's own reaction for each post
+def reaction_state(user_id, post_ids):
+    counts = dict(db.session.execute(select(Post.id, Post.like_count).where(Post.id.in_(post_ids))).all())
+    mine = dict(db.session.execute(
+        select(Like.post_id, Like.is_like).where(Like.user_id == user_id, Like.post_id.in_(post_ids))
+    ).all())
+    names = {True: 'like', False: 'dislike'}
+    return {post_id: {"like_count": count, "reaction": names.get(mine.get(post_id))} for post_id, count in counts.items()}
+
+# One-off for databases created before uq_like_user_post: drop duplicate reactions (keeping the
+# newest row per user and post) and add the unique index the upserts conflict on.
+# Run reconcile-counters afterwards to repair like_count.
+def add_like_unique_key():
+    newest = select(func.max(Like.id)).group_by(Like.user_id, Like.post_id)
+    removed = db.session.execute(delete(Like).where(Like.id.not_in(newest))).rowcount
+    db.session.execute(text('CREATE UNIQUE INDEX IF NOT EXISTS uq_like_user_post ON "like" (user_id, post_id)'))
+    db.session.commit()
+    return removed
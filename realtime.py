@@ -0,0 +1,166 @@
+import json # For message payloads
+import queue # For the in-process broker
+import threading
+import time
+from collections import defaultdict
+from flask import current_app # For broker configuration
+from redis.exceptions import RedisError
+
+POLL_CHANNEL = 'poll:{}' # Redis pub/sub channel per poll
+COMMENT_CHANNEL = 'comments:{}' # Redis pub/sub channel per post thread
+MAX_PENDING_COMMENTS = 200 # Undelivered comments a slow subscriber may fall behind before resyncing
+HEARTBEAT_SECONDS = 15 # Keep idle connections open through proxies
+
+# In-process stand-in for Redis pub/sub, used for local development and tests
+class LocalBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def publish(self, channel, data):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.queue.put({'type': 'message', 'channel': channel, 'data': data})
+        return len(subscribers)
+
+    def pubsub(self, ignore_subscribe_messages=True):
+        return LocalPubSub(self)
+
+class LocalPubSub:
+    def __init__(self, broker):
+        self.broker = broker
+        self.queue = queue.Queue()
+        self.channels = set()
+
+    def subscribe(self, *channels):
+        with self.broker._lock:
+            for channel in channels:
+                self.broker._subscribers[channel].add(self)
+                self.channels.add(channel)
+
+    def get_message(self, ignore_subscribe_messages=True, timeout=0.0):
+        try:
+            return self.queue.get(timeout=timeout) if timeout else self.queue.get_nowait()
+        except queue.Empty:
+            return None
+
+    def close(self):
+        with self.broker._lock:
+            for channel in self.channels:
+                self.broker._subscribers[channel].discard(self)
+        self.channels.clear()
+
+# Returns the pub/sub broker for the current app: Redis by default, LocalBroker when configured
+def get_broker():
+    if current_app.config.get('REALTIME_BROKER') == 'local':
+        return current_app.extensions.setdefault('realtime_local_broker', LocalBroker())
+    return current_app.config['SESSION_REDIS']
+
+def publish(channel, payload):
+    try:
+        get_broker().publish(channel, json.dumps(payload))
+    except RedisError as e:
+        print(f"Failed to publish to {channel}: {e}")
+
+def format_event(event, payload, event_id=None):
+    lines = [f"event: {event}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(payload, default=str)}")
+    return '\n'.join(lines) + '\n\n'
+
+# Called by vote_poll after commit with the option's new absolute count
+def publish_poll_vote(poll_id, option_id, vote_count, total_votes):
+    publish(POLL_CHANNEL.format(poll_id), {
+        'poll_id': poll_id,
+        'option_id': option_id,
+        'vote_count': vote_count,
+        'total_votes': total_votes
+    })
+
+# Merge a vote message into the pending per-poll update. Counts only grow, so the highest seen wins:
+# publishes from several workers can arrive out of order.
+def _coalesce_poll_vote(pending, message):
+    update = pending.setdefault(message['poll_id'], {'poll_id': message['poll_id'], 'options': {}})
+    options = update['options']
+    options[message['option_id']] = max(options.get(message['option_id'], 0), message['vote_count'])
+    update['total_votes'] = max(update.get('total_votes', 0), message['total_votes'])
+
+# SSE generator: emits at most one 'poll' event per poll per interval
+def stream_poll_updates(broker, poll_ids, interval):
+    pubsub = broker.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(*[POLL_CHANNEL.format(poll_id) for poll_id in poll_ids])
+    try:
+        yield f"retry: {int(interval * 1000)}\n\n"
+        pending = {}
+        last_flush = last_sent = time.monotonic()
+        while True:
+            now = time.monotonic()
+            wait = max(0.0, interval - (now - last_flush)) if pending else min(interval, HEARTBEAT_SECONDS)
+            message = pubsub.get_message(ignore_subscribe_messages=True, timeout=wait)
+            if message and message['type'] == 'message':
+                _coalesce_poll_vote(pending, json.loads(message['data']))
+
+            now = time.monotonic()
+            if pending and now - last_flush >= interval:
+                for update in pending.values():
+                    update['options'] = [{'id': option_id, 'vote_count': count} for option_id, count in update['options'].items()]
+                    yield format_event('poll', update)
+                pending = {}
+                last_flush = last_sent = now
+            elif not pending and now - last_sent >= HEARTBEAT_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = now
+    finally:
+        pubsub.close()
+
+# Called by create_comments after commit with the serialized comment
+def publish_comment(comment_data):
+    publish(COMMENT_CHANNEL.format(comment_data['post_id']), comment_data)
+
+# Subscribe before the backlog query so no comment falls between the two
+def subscribe_comments(broker, post_id):
+    pubsub = broker.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(COMMENT_CHANNEL.format(post_id))
+    return pubsub
+
+# SSE generator: replays the backlog after the client's cursor, then pushes new comments.
+# A subscriber that falls more than max_pending comments behind gets a 'resync' event
+# carrying its last delivered cursor and must reconnect from there.
+def stream_comment_updates(pubsub, backlog, cursor=None, max_pending=MAX_PENDING_COMMENTS):
+    try:
+        yield "retry: 3000\n\n"
+        backlog_ids = set()
+        for comment in backlog:
+            backlog_ids.add(comment['id'])
+            cursor = comment['cursor']
+            yield format_event('comment', comment, event_id=cursor)
+        if len(backlog) >= max_pending:
+            yield format_event('resync', {'cursor': cursor})
+            return
+
+        last_sent = time.monotonic()
+        while True:
+            message = pubsub.get_message(ignore_subscribe_messages=True, timeout=HEARTBEAT_SECONDS)
+            pending = []
+            while message is not None:
+                if message['type'] == 'message':
+                    pending.append(json.loads(message['data']))
+                if len(pending) > max_pending:
+                    yield format_event('resync', {'cursor': cursor})
+                    return
+                message = pubsub.get_message(ignore_subscribe_messages=True, timeout=0.0)
+
+            for comment in pending:
+                if comment['id'] in backlog_ids: # Already replayed from the database
+                    continue
+                cursor = comment['cursor']
+                yield format_event('comment', comment, event_id=cursor)
+                last_sent = time.monotonic()
+
+            if time.monotonic() - last_sent >= HEARTBEAT_SECONDS:
+                yield ": keepalive\n\n"
+                last_sent = time.monotonic()
+    finally:
+        pubsub.close()
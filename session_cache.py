@@ -0,0 +1,65 @@
+import threading # The cache is shared by every request thread in the worker
+from cachetools import TTLCache
+from flask_session.redis import RedisSessionInterface
+from itsdangerous import BadSignature
+
+# Redis sessions with a short-lived in-process cache of verified session id -> session data.
+# Hot polling endpoints then skip the Redis GET and msgpack decode on repeat requests.
+# Entries are refreshed whenever this worker saves the session and dropped on logout;
+# other workers may serve a logged-out session for at most SESSION_CACHE_TTL seconds.
+class CachedRedisSessionInterface(RedisSessionInterface):
+    def __init__(self, app, cache_ttl, cache_size, **kwargs):
+        super().__init__(app, **kwargs)
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self._lock = threading.Lock()
+
+    def _verified_sid(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and self.use_signer:
+            try:
+                sid = self._unsign(app, sid)
+            except BadSignature:
+                return None
+        return sid
+
+    def open_session(self, app, request):
+        sid = self._verified_sid(app, request)
+        if sid:
+            with self._lock:
+                data = self.cache.get(sid)
+            if data is not None:
+                return self.session_class(dict(data), sid=sid)
+
+        session = super().open_session(app, request)
+        if sid and session.sid == sid and session: # Loaded from Redis, not a fresh session
+            with self._lock:
+                self.cache[sid] = dict(session)
+        return session
+
+    def save_session(self, app, session, response):
+        if session.modified:
+            with self._lock:
+                if session:
+                    self.cache[session.sid] = dict(session)
+                else:
+                    self.cache.pop(session.sid, None)
+        super().save_session(app, session, response)
+
+    def invalidate(self, sid):
+        with self._lock:
+            self.cache.pop(sid, None)
+
+# Replace the interface Flask-Session installed with the cached one, keeping its settings
+def init_session_cache(app):
+    base = app.session_interface
+    app.session_interface = CachedRedisSessionInterface(
+        app,
+        cache_ttl=app.config.get('SESSION_CACHE_TTL', 10),
+        cache_size=app.config.get('SESSION_CACHE_SIZE', 10000),
+        client=base.client,
+        key_prefix=base.key_prefix,
+        use_signer=base.use_signer,
+        permanent=base.permanent,
+        sid_length=base.sid_length,
+        serialization_format=app.config.get('SESSION_SERIALIZATION_FORMAT', 'msgpack'),
+    )
@@ -0,0 +1,132 @@
+import io
+import os
+import shutil
+import tempfile
+from tempfile import SpooledTemporaryFile
+from flask import current_app
+from google.api_core.exceptions import NotFound
+from instrumentation import timed
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+def emulator_host():
+    return os.getenv('STORAGE_EMULATOR_HOST') # Honoured by google-cloud-storage, e.g. http://localhost:4443
+
+# Public URL of an object in a GCS bucket (or the emulator)
+def media_url(bucket_name, object_name):
+    host = emulator_host()
+    if host:
+        return f"{host.rstrip('/')}/storage/v1/b/{bucket_name}/o/{object_name.replace('/', '%2F')}?alt=media"
+    return f"https://storage.googleapis.com/{bucket_name}/{object_name}"
+
+# Objects in a Google Cloud Storage bucket
+class GCSStorage:
+    name = 'gcs'
+
+    def __init__(self, bucket_name, client_factory):
+        self.bucket_name = bucket_name
+        self.client_factory = client_factory # Called per use so tests and benchmarks can swap the client
+
+    def bucket(self):
+        return self.client_factory().bucket(self.bucket_name)
+
+    def url(self, object_name):
+        return media_url(self.bucket_name, object_name)
+
+    # Stream a file-like object into the bucket, returns its URL
+    def save(self, file, object_name, content_type=None, size=None):
+        with timed('gcs'):
+            # A known size lets the client pick single-shot vs resumable
+            self.bucket().blob(object_name).upload_from_file(file, content_type=content_type, size=size)
+        return self.url(object_name)
+
+    def delete(self, object_name):
+        with timed('gcs'):
+            try:
+                self.bucket().blob(object_name).delete()
+            except NotFound:
+                pass
+
+# Objects as files under a local directory, for single-node deployments and offline benchmarks.
+# Callers pass content-addressed names (media/<sha256[:2]>/<sha256>-...), so the tree is sharded by hash.
+# Writes land in a temp file on the same filesystem and are renamed into place, so readers never see
+# a partial file; served through /uploads, where the WSGI server's file wrapper sends them with sendfile.
+class LocalStorage:
+    name = 'local'
+
+    def __init__(self, root, base_url):
+        self.root = os.path.abspath(root)
+        self.base_url = base_url.rstrip('/')
+        self.tmp_dir = os.path.join(self.root, '.tmp') # Dot directories are never served
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path(self, object_name):
+        path = os.path.abspath(os.path.join(self.root, object_name))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f"Object name escapes the storage root: {object_name}")
+        return path
+
+    def url(self, object_name):
+        return f"{self.base_url}/{object_name}"
+
+    def save(self, file, object_name, content_type=None, size=None):
+        path = self.path(object_name)
+        with timed('disk'):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    _copy_into(getattr(file, 'stream', file), out)
+                    out.flush()
+                    os.fsync(out.fileno())
+                os.replace(tmp_path, path) # Atomic on the same filesystem
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        return self.url(object_name)
+
+    def delete(self, object_name):
+        with timed('disk'):
+            try:
+                os.remove(self.path(object_name))
+            except FileNotFoundError:
+                pass
+
+# Copy from the source's current position. Sources backed by a real file (a spilled upload)
+# are copied in the kernel with os.sendfile; in-memory ones fall back to a buffered copy.
+def _copy_into(source, out):
+    fileno = _real_fileno(source)
+    if fileno is None:
+        shutil.copyfileobj(source, out, COPY_CHUNK_SIZE)
+        return
+    out.flush()
+    offset = source.tell()
+    while True:
+        sent = os.sendfile(out.fileno(), fileno, offset, COPY_CHUNK_SIZE)
+        if sent == 0:
+            break
+        offset += sent
+    source.seek(offset)
+
+def _real_fileno(source):
+    if isinstance(source, SpooledTemporaryFile) and not source._rolled:
+        return None # fileno() would force the in-memory buffer out to disk
+    try:
+        return source.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+
+# Build the configured backend once per app: STORAGE_BACKEND is 'gcs' or 'local'
+def init_storage(app, gcs_client_factory):
+    backend = app.config['STORAGE_BACKEND']
+    if backend == 'local':
+        storage = LocalStorage(os.path.join(app.root_path, app.config['LOCAL_STORAGE_ROOT']), app.config['LOCAL_STORAGE_URL'])
+    elif backend == 'gcs':
+        storage = GCSStorage(app.config['GOOGLE_CLOUD_STORAGE_BUCKET'], gcs_client_factory)
+    else:
+        raise ValueError(f"Unknown STORAGE_BACKEND: {backend}")
+    app.extensions['storage'] = storage
+    return storage
+
+def get_storage():
+    return current_app.extensions['storage']
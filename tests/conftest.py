@@ -0,0 +1,59 @@
+# Tests run the app against a throwaway SQLite database, local-disk media storage and an in-memory
+# Redis, so no services are needed: pip install pytest fakeredis
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# config.py reads the environment at import time
+_scratch = tempfile.mkdtemp(prefix='campuscircle-tests-')
+os.environ.setdefault('SECRET_KEY', 'test-secret')
+os.environ['DATABASE_URI'] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ.setdefault('GOOGLE_CLOUD_STORAGE_BUCKET', 'test-bucket')
+os.environ.setdefault('GOOGLE_APPLICATION_CREDENTIALS', os.devnull)
+os.environ['STORAGE_BACKEND'] = 'local'
+os.environ['LOCAL_STORAGE_ROOT'] = os.path.join(_scratch, 'media')
+
+@pytest.fixture
+def app():
+    fakeredis = pytest.importorskip('fakeredis')
+    from app import app as flask_app
+    from database import db
+
+    redis_client = fakeredis.FakeRedis()
+    flask_app.config['SESSION_REDIS'] = redis_client
+    flask_app.session_interface.client = redis_client
+    flask_app.session_interface.cache.clear()
+    with flask_app.app_context():
+        db.engine.echo = False
+        db.create_all()
+        yield flask_app
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def make_user(app):
+    from database import db
+    from models import User
+
+    def make_user(username):
+        user = User(username=username, email=f"{username}@example.edu", password='x')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+    return make_user
+
+# Log the test client in as user_id through the Redis session
+@pytest.fixture
+def login(client):
+    def login(user_id):
+        with client.session_transaction() as session:
+            session['user_id'] = user_id
+    return login
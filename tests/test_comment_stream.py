@@ -0,0 +1,49 @@
+import json
+from datetime import datetime
+import pytest
+from database import db
+from models import Comment, Post
+from pagination import encode_cursor
+import realtime
+
+@pytest.fixture
+def post_id(make_user):
+    user_id = make_user('poster')
+    post = Post(id='post', user_id=user_id, content_type='image/jpeg', content_url='/uploads/post.jpg')
+    db.session.add(post)
+    db.session.commit()
+    return post.id
+
+@pytest.fixture(autouse=True)
+def short_heartbeat(monkeypatch):
+    monkeypatch.setattr(realtime, 'HEARTBEAT_SECONDS', 0.2) # The first keepalive marks the end of the replay
+
+# Comment ids replayed after cursor, before the stream goes live
+def replayed(client, post_id, cursor):
+    response = client.get(f"/stream_comments/{post_id}", headers={'Last-Event-ID': cursor}, buffered=False)
+    events = []
+    try:
+        for chunk in response.response:
+            chunk = chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+            if chunk.startswith('event: comment'):
+                events.append(json.loads(chunk.split('data: ', 1)[1])['id'])
+            if chunk.startswith((': keepalive', 'event: resync')):
+                break
+    finally:
+        response.close()
+    return events
+
+def test_resume_replays_comments_after_the_cursor(client, login, post_id):
+    login(db.session.get(Post, post_id).user_id)
+    created = [client.post('/create_comments', json={'post_id': post_id, 'text': f"comment {i}"}).json for i in range(4)]
+
+    assert replayed(client, post_id, created[0]['cursor']) == [comment['id'] for comment in created[1:]]
+
+def test_resume_replays_comments_from_the_cursors_second(client, post_id):
+    same_second = datetime(2026, 1, 1, 12, 0, 0)
+    user_id = db.session.get(Post, post_id).user_id
+    comments = [Comment(id=f"c{i}", post_id=post_id, user_id=user_id, text=f"comment {i}", timestamp=same_second) for i in range(4)]
+    db.session.add_all(comments)
+    db.session.commit()
+
+    assert replayed(client, post_id, encode_cursor(same_second, 'c0')) == ['c1', 'c2', 'c3']
@@ -0,0 +1,51 @@
+import base64
+import io
+import os
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+import pytest
+from PIL import Image
+from database import db
+from media import collect_media_garbage
+from models import Media
+from storage import get_storage
+
+class FakeImages:
+    def generate(self, **kwargs):
+        encoded = io.BytesIO()
+        Image.new('RGB', (16, 16), 'orange').save(encoded, 'PNG')
+        return SimpleNamespace(data=[SimpleNamespace(b64_json=base64.b64encode(encoded.getvalue()).decode('ascii'))])
+
+class FakeOpenAI:
+    images = FakeImages()
+
+    def with_options(self, **kwargs):
+        return self
+
+@pytest.fixture
+def generated(app, client, make_user, login, monkeypatch):
+    monkeypatch.setattr(app.extensions['ai_gateway'], 'client', FakeOpenAI())
+    login(make_user('artist'))
+    response = client.post('/create_image_w_prompt', data={'prompt': 'a campus at sunset'})
+    assert response.status_code == 200
+    return response.json['image_url']
+
+def test_generated_image_survives_garbage_collection_until_its_pin_expires(app, client, generated):
+    media = db.session.query(Media).filter_by(url=generated).one()
+    assert media.ref_count == 0
+    path = get_storage().path(media.object_name)
+
+    assert collect_media_garbage(get_storage(), 0) == 0 # Past the grace period but pinned
+    assert client.get(generated).status_code == 200
+
+    media.pinned_until = datetime.now(timezone.utc) - timedelta(seconds=1)
+    db.session.commit()
+    assert collect_media_garbage(get_storage(), 0) == 1
+    assert not os.path.exists(path)
+
+def test_posting_a_generated_image_references_the_stored_object(app, client, generated):
+    image = client.get(generated).data
+    response = client.post('/posts', data={'newImage': (io.BytesIO(image), 'generated.webp', 'image/webp')}, content_type='multipart/form-data')
+    assert response.status_code == 201
+    assert response.json['content_url'] == generated
+    assert db.session.query(Media).filter_by(url=generated).one().ref_count == 1
@@ -0,0 +1,18 @@
+from collections import defaultdict
+import pytest
+from flask import g
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from database import db
+
+def test_failed_statements_leave_no_timing_state_on_the_connection(app):
+    g.timings = defaultdict(float)
+    connection = db.session.connection()
+    with pytest.raises(OperationalError):
+        connection.execute(text('SELECT * FROM no_such_table'))
+    db.session.rollback()
+
+    connection = db.session.connection()
+    connection.execute(text('SELECT 1'))
+    assert 'query_started' not in connection.info
+    assert g.timings['db'] > 0
@@ -0,0 +1,117 @@
+import os
+import pytest
+from flask import Flask
+from media_serving import send_media
+
+BODY = bytes(range(256)) * 40 # 10240 bytes
+
+@pytest.fixture
+def media_app(tmp_path):
+    app = Flask(__name__)
+    app.config.update(MEDIA_SENDFILE='', MEDIA_ACCEL_PREFIX='/protected-uploads', MEDIA_MAX_AGE=3600)
+    (tmp_path / 'clip.mp4').write_bytes(BODY)
+
+    @app.route('/uploads/<path:filename>')
+    def send_image(filename):
+        return send_media(str(tmp_path), filename)
+    return app
+
+@pytest.fixture
+def media_client(media_app):
+    return media_app.test_client()
+
+# A server's wsgi.file_wrapper that sends Content-Length bytes from wherever the file is positioned
+class OffsetFileWrapper:
+    wrapped = []
+
+    def __init__(self, filelike, block_size=8192):
+        self.filelike = filelike
+        self.wrapped.append(filelike.tell())
+
+    def __iter__(self):
+        return iter([self.filelike.read()])
+
+    def close(self):
+        self.filelike.close()
+
+def test_range_returns_partial_content(media_client):
+    response = media_client.get('/uploads/clip.mp4', headers={'Range': 'bytes=100-199'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f"bytes 100-199/{len(BODY)}"
+    assert response.headers['Content-Length'] == '100'
+    assert response.data == BODY[100:200]
+
+def test_suffix_range_returns_the_tail(media_client):
+    response = media_client.get('/uploads/clip.mp4', headers={'Range': 'bytes=-500'})
+    assert response.status_code == 206
+    assert response.headers['Content-Range'] == f"bytes {len(BODY) - 500}-{len(BODY) - 1}/{len(BODY)}"
+    assert response.data == BODY[-500:]
+
+def test_unsatisfiable_range(media_client):
+    response = media_client.get('/uploads/clip.mp4', headers={'Range': f"bytes={len(BODY)}-"})
+    assert response.status_code == 416
+    assert response.headers['Content-Range'] == f"bytes */{len(BODY)}"
+
+def test_stale_if_range_sends_the_whole_file(media_client):
+    response = media_client.get('/uploads/clip.mp4', headers={'Range': 'bytes=0-99', 'If-Range': '"stale-etag"'})
+    assert response.status_code == 200
+    assert response.data == BODY
+
+def test_matching_if_range_sends_the_range(media_client):
+    etag = media_client.get('/uploads/clip.mp4').headers['ETag']
+    response = media_client.get('/uploads/clip.mp4', headers={'Range': 'bytes=0-99', 'If-Range': etag})
+    assert response.status_code == 206
+    assert response.data == BODY[:100]
+
+def test_if_none_match_revalidates(media_client):
+    first = media_client.get('/uploads/clip.mp4')
+    assert first.status_code == 200
+    assert first.headers['Accept-Ranges'] == 'bytes'
+    response = media_client.get('/uploads/clip.mp4', headers={'If-None-Match': first.headers['ETag']})
+    assert response.status_code == 304
+    assert response.data == b''
+
+def test_hidden_and_missing_files_are_not_found(media_client, tmp_path):
+    os.mkdir(tmp_path / '.tmp')
+    (tmp_path / '.tmp' / 'partial').write_bytes(b'x')
+    assert media_client.get('/uploads/.tmp/partial').status_code == 404
+    assert media_client.get('/uploads/missing.mp4').status_code == 404
+
+def test_ranges_use_an_offset_honouring_file_wrapper(media_client, monkeypatch):
+    monkeypatch.setattr(OffsetFileWrapper, '__module__', 'gunicorn.http.wsgi')
+    monkeypatch.setattr(OffsetFileWrapper, 'wrapped', [])
+    response = media_client.get('/uploads/clip.mp4', headers={'Range': 'bytes=100-199'},
+                                environ_overrides={'wsgi.file_wrapper': OffsetFileWrapper})
+    assert response.status_code == 206
+    assert OffsetFileWrapper.wrapped[-1] == 100 # Handed over positioned at the range start, send_file wrapped it at 0
+    assert response.headers['Content-Length'] == '100'
+    assert response.get_data()[:100] == BODY[100:200] # The server stops after Content-Length bytes
+
+def test_ranges_skip_other_file_wrappers(media_client, monkeypatch):
+    monkeypatch.setattr(OffsetFileWrapper, '__module__', 'uwsgi')
+    monkeypatch.setattr(OffsetFileWrapper, 'wrapped', [])
+    response = media_client.get('/uploads/clip.mp4', headers={'Range': 'bytes=100-199'},
+                                environ_overrides={'wsgi.file_wrapper': OffsetFileWrapper})
+    assert response.status_code == 206
+    assert 100 not in OffsetFileWrapper.wrapped # Only send_file's own whole-file wrapper
+    assert response.data == BODY[100:200]
+
+def test_x_accel_redirect_hands_the_body_to_nginx(media_app):
+    media_app.config['MEDIA_SENDFILE'] = 'x-accel-redirect'
+    client = media_app.test_client()
+    response = client.get('/uploads/clip.mp4', headers={'Range': 'bytes=0-99'})
+    assert response.status_code == 200 # nginx slices the range from the file
+    assert response.headers['X-Accel-Redirect'] == '/protected-uploads/clip.mp4'
+    assert response.headers['Accept-Ranges'] == 'bytes'
+    assert response.data == b''
+    assert client.get('/uploads/clip.mp4', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+def test_x_sendfile_hands_the_path_to_the_server(media_app, tmp_path):
+    media_app.config['MEDIA_SENDFILE'] = 'x-sendfile'
+    client = media_app.test_client()
+    response = client.get('/uploads/clip.mp4')
+    assert response.status_code == 200
+    assert response.headers['X-Sendfile'] == str(tmp_path / 'clip.mp4')
+    assert response.mimetype == 'video/mp4'
+    assert response.data == b''
+    assert client.get('/uploads/clip.mp4', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
@@ -0,0 +1,36 @@
+import json
+import time
+import pytest
+import realtime
+from realtime import get_broker, publish_poll_vote, stream_poll_updates
+
+INTERVAL = 0.2
+
+@pytest.fixture
+def broker(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'REALTIME_BROKER', 'local')
+    monkeypatch.setattr(realtime, 'HEARTBEAT_SECONDS', 5)
+    return get_broker()
+
+def poll_event(chunk):
+    assert chunk.startswith('event: poll'), chunk
+    payload = json.loads(chunk.split('data: ', 1)[1])
+    return payload['total_votes'], {option['id']: option['vote_count'] for option in payload['options']}
+
+def test_a_burst_of_votes_arrives_as_one_event_per_interval(broker):
+    stream = stream_poll_updates(broker, ['poll'], INTERVAL)
+    try:
+        assert next(stream).startswith('retry:') # Subscribed
+
+        # Out of order, as publishes from several workers can be
+        for option_id, vote_count, total_votes in [('a', 1, 1), ('b', 1, 2), ('a', 3, 5), ('a', 2, 3), ('b', 2, 4)]:
+            publish_poll_vote('poll', option_id, vote_count, total_votes)
+        started = time.monotonic()
+        assert poll_event(next(stream)) == (5, {'a': 3, 'b': 2})
+
+        publish_poll_vote('poll', 'b', 3, 6)
+        publish_poll_vote('poll', 'b', 4, 7)
+        assert poll_event(next(stream)) == (7, {'b': 4})
+        assert time.monotonic() - started >= INTERVAL # The second burst waited for the next interval
+    finally:
+        stream.close()
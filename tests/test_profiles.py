@@ -0,0 +1,26 @@
+import io
+from PIL import Image
+
+def png():
+    encoded = io.BytesIO()
+    Image.new('RGB', (8, 8), 'teal').save(encoded, 'PNG')
+    return encoded.getvalue()
+
+def test_profile_picture_uploaded_through_storage_is_served(client, make_user):
+    user_id = make_user('pictured')
+    picture = png()
+    response = client.patch(f"/users/{user_id}", data={'profileImage': (io.BytesIO(picture), 'me.png', 'image/png')},
+                            content_type='multipart/form-data')
+    assert response.status_code == 200
+    picture_url = response.json['profile_picture']
+
+    profile = client.get(f"/users/{user_id}")
+    assert profile.status_code == 200
+    assert profile.json['profile_picture'] == picture_url
+    assert client.get(picture_url).data == picture
+
+def test_profile_without_picture(client, make_user):
+    user_id = make_user('plain')
+    profile = client.get(f"/users/{user_id}")
+    assert profile.status_code == 200
+    assert profile.json['profile_picture'] is None
@@ -0,0 +1,48 @@
+import pytest
+from database import db
+from models import Post
+
+@pytest.fixture
+def post_ids(make_user):
+    user_id = make_user('author')
+    posts = [Post(id=f"p{i}", user_id=user_id, content_type='image/jpeg', content_url=f"/uploads/p{i}.jpg") for i in range(2)]
+    db.session.add_all(posts)
+    db.session.commit()
+    return [post.id for post in posts]
+
+def react(client, *operations):
+    response = client.post('/reactions', json={'reactions': [{'post_id': post_id, 'reaction': reaction} for post_id, reaction in operations]})
+    assert response.status_code == 200
+    return {post_id: (state['like_count'], state['reaction']) for post_id, state in response.json['posts'].items()}
+
+def test_batches_move_like_count_by_what_changed(client, make_user, login, post_ids):
+    first, second = post_ids
+    login(make_user('reader'))
+
+    assert react(client, (first, 'like'), (second, 'dislike')) == {first: (1, 'like'), second: (-1, 'dislike')}
+    assert react(client, (first, 'like'), (second, 'dislike')) == {first: (1, 'like'), second: (-1, 'dislike')} # Unchanged
+    assert react(client, (first, 'dislike'), (second, 'clear')) == {first: (-1, 'dislike'), second: (0, None)}
+    assert react(client, (first, 'clear'), (first, 'like')) == {first: (1, 'like')} # Last operation wins
+
+def test_reactions_from_several_users_add_up(client, make_user, login, post_ids):
+    first, _ = post_ids
+    for name in ('a', 'b', 'c'):
+        login(make_user(name))
+        react(client, (first, 'like'))
+    assert db.session.get(Post, first).like_count == 3
+
+@pytest.mark.parametrize('keys', [[['k']], [1, 'k'], ['']])
+def test_idempotency_keys_must_be_strings(client, make_user, login, post_ids, keys):
+    login(make_user('reader'))
+    operations = [{'post_id': post_ids[0], 'reaction': 'like', 'idempotency_key': key} for key in keys]
+    response = client.post('/reactions', json={'reactions': operations})
+    assert response.status_code == 400
+    assert db.session.get(Post, post_ids[0]).like_count == 0
+
+def test_applied_idempotency_keys_are_skipped(client, make_user, login, post_ids):
+    first, _ = post_ids
+    login(make_user('reader'))
+    operation = {'post_id': first, 'reaction': 'like', 'idempotency_key': 'k1'}
+    assert client.post('/reactions', json={'reactions': [operation]}).json['skipped'] == []
+    assert client.post('/reactions', json={'reactions': [operation]}).json['skipped'] == ['k1']
+    assert db.session.get(Post, first).like_count == 1
@@ -0,0 +1,53 @@
+from datetime import datetime
+from sqlalchemy import text
+from database import db
+from models import Post, saved_posts_table
+
+def make_posts(user_id, count):
+    posts = [Post(id=f"p{i}", user_id=user_id, content_type='image/jpeg', content_url=f"/uploads/p{i}.jpg") for i in range(count)]
+    db.session.add_all(posts)
+    db.session.commit()
+    return [post.id for post in posts]
+
+def page_through(client, per_page):
+    seen, cursor = [], None
+    for _ in range(20): # A cursor that stops advancing would loop forever
+        response = client.get('/saved_posts', query_string={'per_page': per_page, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen.extend(post['id'] for post in response.json['posts'])
+        if not response.json['has_next']:
+            return seen
+        cursor = response.json['next_cursor']
+    raise AssertionError(f"pagination did not finish, saw {seen}")
+
+def test_pages_through_posts_saved_in_the_same_second(client, make_user, login):
+    user_id = make_user('saver')
+    post_ids = make_posts(user_id, 5)
+    same_second = datetime(2026, 1, 1, 12, 0, 0)
+    db.session.execute(saved_posts_table.insert(), [{'user_id': user_id, 'post_id': post_id, 'saved_at': same_second} for post_id in post_ids])
+    db.session.commit()
+    login(user_id)
+
+    assert page_through(client, per_page=2) == sorted(post_ids, reverse=True)
+
+def test_saves_get_distinct_timestamps(client, make_user, login):
+    user_id = make_user('saver')
+    post_ids = make_posts(user_id, 5)
+    login(user_id)
+    for post_id in post_ids:
+        assert client.post(f"/save_post/{post_id}").status_code == 201
+
+    assert page_through(client, per_page=2) == list(reversed(post_ids))
+
+def test_whole_second_sqlite_timestamps_page_after_normalizing(app, client, make_user, login):
+    user_id = make_user('saver')
+    post_ids = make_posts(user_id, 5)
+    for post_id in post_ids: # As written by the CURRENT_TIMESTAMP server default
+        db.session.execute(text("INSERT INTO saved_posts (user_id, post_id, saved_at) VALUES (:user_id, :post_id, '2026-01-01 12:00:00')"),
+                           {'user_id': user_id, 'post_id': post_id})
+    db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['normalize-sqlite-timestamps'])
+    assert 'Normalized 5 timestamps' in result.output
+    login(user_id)
+    assert page_through(client, per_page=2) == sorted(post_ids, reverse=True)
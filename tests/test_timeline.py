@@ -0,0 +1,73 @@
+import time
+from datetime import datetime, timezone
+import pytest
+from redis.exceptions import RedisError
+import app as app_module
+from database import db
+from models import Follow, Post
+import timeline
+from timeline import fan_out_post
+
+SAME_SECOND = datetime(2026, 1, 1, 12, 0, 0)
+
+@pytest.fixture
+def posts_in_one_second(make_user):
+    user_id = make_user('poster')
+    posts = [Post(id=f"p{i:02d}", user_id=user_id, content_type='image/jpeg', content_url=f"/uploads/p{i}.jpg", timestamp=SAME_SECOND)
+             for i in range(25)]
+    db.session.add_all(posts)
+    db.session.commit()
+    for post in posts:
+        fan_out_post(post)
+    return user_id, sorted((post.id for post in posts), reverse=True)
+
+def page_through(client, per_page):
+    seen, cursor = [], None
+    for _ in range(50):
+        response = client.get('/posts', query_string={'per_page': per_page, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        seen.extend(post['id'] for post in response.json['posts'])
+        if not response.json['has_next']:
+            return seen
+        cursor = response.json['next_cursor']
+    raise AssertionError(f"pagination did not finish, saw {seen}")
+
+def test_timeline_serves_every_post_sharing_a_second(client, login, posts_in_one_second):
+    user_id, post_ids = posts_in_one_second
+    login(user_id)
+    assert page_through(client, per_page=5) == post_ids
+
+def test_database_fallback_serves_every_post_sharing_a_second(client, login, posts_in_one_second, monkeypatch):
+    user_id, post_ids = posts_in_one_second
+    def unavailable(*args):
+        raise RedisError("down")
+    monkeypatch.setattr(app_module, 'read_timeline', unavailable)
+    login(user_id)
+    assert page_through(client, per_page=5) == post_ids
+
+def test_posts_get_distinct_timestamps(make_user):
+    user_id = make_user('poster')
+    posts = [Post(user_id=user_id, content_type='image/jpeg', content_url='/uploads/x.jpg') for _ in range(5)]
+    db.session.add_all(posts)
+    db.session.commit()
+    assert len({post.timestamp for post in posts}) == 5
+
+def test_racing_follow_answers_already_following(client, login, make_user, monkeypatch):
+    follower, followed = make_user('follower'), make_user('followed')
+    db.session.add(Follow(follower_id=follower, followed_id=followed))
+    db.session.commit()
+    monkeypatch.setattr(db.session, 'get', lambda *args, **kwargs: None) # The other request inserts after our check
+    login(follower)
+
+    response = client.post(f"/follow/{followed}")
+    assert response.status_code == 200
+    assert response.json == {"message": "Already following"}
+
+def test_naive_timestamps_score_as_utc(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    try:
+        assert timeline._score(SAME_SECOND) == SAME_SECOND.replace(tzinfo=timezone.utc).timestamp()
+    finally:
+        monkeypatch.undo()
+        time.tzset()
@@ -0,0 +1,20 @@
+import pytest
+from tokens import issue_token_pair, verify_token, revoke
+
+@pytest.fixture
+def token_client(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'TOKEN_AUTH_ENABLED', True)
+    return client
+
+def test_a_refresh_token_is_exchanged_once(token_client, make_user):
+    refresh_token = issue_token_pair(make_user('reader'))['refresh_token']
+
+    first = token_client.post('/token/refresh', json={'refresh_token': refresh_token})
+    assert first.status_code == 200
+    assert first.json['refresh_token'] != refresh_token
+    assert token_client.post('/token/refresh', json={'refresh_token': refresh_token}).status_code == 401
+
+def test_only_one_concurrent_revoke_takes(app, make_user):
+    claims = verify_token('refresh', issue_token_pair(make_user('reader'))['refresh_token'])
+    assert revoke('refresh', claims) is True
+    assert revoke('refresh', claims) is False # The racing refresh is turned away
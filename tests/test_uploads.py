@@ -0,0 +1,17 @@
+import io
+import pytest
+
+@pytest.fixture
+def small_image_cap(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'MAX_IMAGE_UPLOAD_SIZE', 1024)
+
+@pytest.mark.parametrize('path, field, form', [
+    ('/posts', 'newImage', {}),
+    ('/manipulate_image', 'image', {'prompt': 'make it blue'}),
+])
+def test_oversized_image_parts_are_rejected_with_413(client, make_user, login, small_image_cap, path, field, form):
+    login(make_user('uploader'))
+    response = client.post(path, data={**form, field: (io.BytesIO(b'\x89PNG' + b'\0' * 4096), 'big.png', 'image/png')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 413
+    assert 'limited to 1024 bytes' in response.json['error']
@@ -0,0 +1,160 @@
+import heapq # For merging timeline sources
+from flask import current_app # For the shared Redis connection
+from redis.exceptions import RedisError
+from sqlalchemy import and_, or_, desc
+from database import db # Import the database instance
+from models import Follow, Post, User, as_utc
+
+TIMELINE_KEY = 'timeline:{}' # Redis sorted set of post ids scored by post timestamp
+TIMELINE_LENGTH = 800 # Posts kept per precomputed timeline
+FANOUT_BATCH_SIZE = 1000 # Followers written per Redis pipeline
+FOLLOW_BACKFILL = 50 # Recent posts copied into a timeline on follow
+
+def get_redis():
+    return current_app.config['SESSION_REDIS']
+
+# Accounts above this follower count are merged at read time instead of fanned out on write
+def celebrity_threshold():
+    return current_app.config.get('TIMELINE_FANOUT_LIMIT', 10000)
+
+# Epoch seconds; naive timestamps are UTC, not the server's local time
+def _score(timestamp):
+    return as_utc(timestamp).timestamp()
+
+def _member(member):
+    return member.decode('utf-8') if isinstance(member, bytes) else member
+
+def _add_entries(pipe, user_id, entries):
+    key = TIMELINE_KEY.format(user_id)
+    pipe.zadd(key, entries)
+    pipe.zremrangebyrank(key, 0, -TIMELINE_LENGTH - 1) # Trim to the newest TIMELINE_LENGTH posts
+
+# Fan-out-on-write: push a new post into the author's and every follower's timeline
+def fan_out_post(post):
+    entries = {post.id: _score(post.timestamp)}
+    try:
+        redis_client = get_redis()
+        pipe = redis_client.pipeline(transaction=False)
+        _add_entries(pipe, post.user_id, entries) # Home feed includes your own posts
+        pipe.execute()
+
+        author = db.session.query(User.follower_count).filter(User.id == post.user_id).scalar() or 0
+        if author >= celebrity_threshold():
+            return # Followers pick these up in read_timeline
+
+        last_follower = ''
+        while True:
+            follower_ids = [row.follower_id for row in (
+                db.session.query(Follow.follower_id)
+                .filter(Follow.followed_id == post.user_id, Follow.follower_id > last_follower)
+                .order_by(Follow.follower_id)
+                .limit(FANOUT_BATCH_SIZE)
+            )]
+            if not follower_ids:
+                break
+            pipe = redis_client.pipeline(transaction=False)
+            for follower_id in follower_ids:
+                _add_entries(pipe, follower_id, entries)
+            pipe.execute()
+            last_follower = follower_ids[-1]
+    except RedisError as e:
+        print(f"Failed to fan out post {post.id}: {e}") # Timeline is rebuilt from the database on next cold read
+
+# Copy the followed account's recent posts into the follower's timeline
+def on_follow(follower_id, followed_id):
+    recent = (
+        db.session.query(Post.id, Post.timestamp)
+        .filter(Post.user_id == followed_id)
+        .order_by(desc(Post.timestamp))
+        .limit(FOLLOW_BACKFILL)
+        .all()
+    )
+    if not recent:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        _add_entries(pipe, follower_id, {row.id: _score(row.timestamp) for row in recent})
+        pipe.execute()
+    except RedisError as e:
+        print(f"Failed to backfill timeline: {e}")
+
+# Drop the unfollowed account's posts still sitting in the follower's timeline
+def on_unfollow(follower_id, followed_id):
+    post_ids = [row.id for row in (
+        db.session.query(Post.id)
+        .filter(Post.user_id == followed_id)
+        .order_by(desc(Post.timestamp))
+        .limit(TIMELINE_LENGTH)
+    )]
+    if not post_ids:
+        return
+    try:
+        get_redis().zrem(TIMELINE_KEY.format(follower_id), *post_ids)
+    except RedisError as e:
+        print(f"Failed to prune timeline: {e}")
+
+# Keyset query of recent posts by the given authors, newest first, as (timestamp, id) pairs
+def _recent_posts(author_ids, before, limit):
+    if not author_ids:
+        return []
+    query = db.session.query(Post.id, Post.timestamp).filter(Post.user_id.in_(author_ids))
+    if before:
+        before_timestamp, before_id = before
+        query = query.filter(or_(
+            Post.timestamp < before_timestamp,
+            and_(Post.timestamp == before_timestamp, Post.id < before_id)
+        ))
+    return [(_score(row.timestamp), row.id) for row in query.order_by(desc(Post.timestamp), desc(Post.id)).limit(limit)]
+
+# Fan-out-on-read over everyone the user follows, used when Redis is unavailable
+def read_timeline_from_database(user_id, before, limit):
+    followed_ids = [row.followed_id for row in db.session.query(Follow.followed_id).filter(Follow.follower_id == user_id)]
+    return _recent_posts(followed_ids + [user_id], before, limit)
+
+# Rebuild a missing timeline from the database (new user, Redis flush, eviction)
+def rebuild_timeline(user_id):
+    entries = read_timeline_from_database(user_id, None, TIMELINE_LENGTH)
+    if entries:
+        pipe = get_redis().pipeline(transaction=True)
+        _add_entries(pipe, user_id, {post_id: score for score, post_id in entries})
+        pipe.execute()
+    return entries
+
+# Timeline page as a list of post ids, newest first, strictly after the (timestamp, id) cursor.
+# Reads are O(log n + page) in the timeline plus one indexed query per page for celebrity accounts.
+def read_timeline(user_id, before, limit):
+    key = TIMELINE_KEY.format(user_id)
+    redis_client = get_redis()
+    max_score = _score(before[0]) if before else '+inf'
+
+    if before:
+        # Posts sharing the cursor's score sort by id, so take those below the cursor id and the
+        # strictly older range separately; a fixed overscan runs dry when many posts share a second
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zrevrangebyscore(key, max_score, max_score, withscores=True)
+        pipe.zrevrangebyscore(key, f"({max_score!r}", '-inf', start=0, num=limit + 1, withscores=True)
+        same_score, older = pipe.execute()
+        raw = [(member, score) for member, score in same_score if _member(member) < before[1]] + older
+    else:
+        raw = redis_client.zrevrangebyscore(key, max_score, '-inf', start=0, num=limit + 1, withscores=True)
+        if not raw and not redis_client.exists(key):
+            rebuild_timeline(user_id)
+            raw = redis_client.zrevrangebyscore(key, max_score, '-inf', start=0, num=limit + 1, withscores=True)
+    pushed = [(score, _member(member)) for member, score in raw][:limit + 1]
+
+    # Fan-out-on-read for followed accounts too large to push to every follower
+    celebrity_ids = [row.id for row in (
+        db.session.query(User.id)
+        .join(Follow, Follow.followed_id == User.id)
+        .filter(Follow.follower_id == user_id, User.follower_count >= celebrity_threshold())
+    )]
+    pulled = _recent_posts(celebrity_ids, before, limit + 1)
+
+    merged = []
+    seen = set()
+    for score, post_id in heapq.merge(pushed, pulled, reverse=True):
+        if post_id in seen:
+            continue
+        seen.add(post_id)
+        merged.append(post_id)
+    return merged[:limit + 1]
@@ -0,0 +1,93 @@
+import secrets # For token ids
+import time
+from flask import current_app
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from redis.exceptions import RedisError
+
+DENYLIST_KEY = 'token:denylist:{}' # Redis key per revoked token id
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+def _serializer(kind):
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=f"campuscircle-{kind}-token")
+
+def _ttl(kind):
+    return current_app.config['ACCESS_TOKEN_TTL'] if kind == 'access' else current_app.config['REFRESH_TOKEN_TTL']
+
+def issue_token(kind, user_id):
+    return _serializer(kind).dumps({'uid': user_id, 'jti': secrets.token_urlsafe(12), 'iat': int(time.time())})
+
+# Access and refresh token pair for a user
+def issue_token_pair(user_id):
+    return {
+        'access_token': issue_token('access', user_id),
+        'refresh_token': issue_token('refresh', user_id),
+        'token_type': 'Bearer',
+        'expires_in': current_app.config['ACCESS_TOKEN_TTL']
+    }
+
+# Verify signature and age in-process, returns the claims or None
+def verify_token(kind, token):
+    try:
+        return _serializer(kind).loads(token, max_age=_ttl(kind))
+    except (SignatureExpired, BadSignature):
+        return None
+
+def is_revoked(claims):
+    return bool(current_app.config['SESSION_REDIS'].exists(DENYLIST_KEY.format(claims['jti'])))
+
+# Denylist a token until it would have expired anyway. Returns False if it already was, so a
+# refresh token is only ever exchanged once even when two requests race with it.
+def revoke(kind, claims):
+    remaining = max(int(claims['iat'] + _ttl(kind) - time.time()), 1)
+    return bool(current_app.config['SESSION_REDIS'].set(DENYLIST_KEY.format(claims['jti']), 1, nx=True, ex=remaining))
+
+def bearer_token(request):
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        return header[len('Bearer '):].strip()
+    return None
+
+# Request-scoped session built from an access token, never persisted.
+# An invalid or revoked token gives an empty (anonymous) session.
+class TokenSession(dict, SessionMixin):
+    modified = False
+    accessed = False
+
+    def __init__(self, claims):
+        super().__init__(**({'user_id': claims['uid']} if claims else {}))
+        self.claims = claims
+
+# Serves Authorization: Bearer requests from the token alone and everything else from the wrapped
+# server-side session interface. Reads are verified entirely in-process; writes also check the
+# Redis denylist so a revoked token stops working immediately for anything that changes state.
+class TokenSessionInterface(SessionInterface):
+    def __init__(self, inner):
+        self.inner = inner
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def open_session(self, app, request):
+        token = bearer_token(request)
+        if token is None:
+            return self.inner.open_session(app, request)
+
+        claims = verify_token('access', token)
+        if claims is not None and request.method not in SAFE_METHODS:
+            try:
+                if is_revoked(claims):
+                    claims = None
+            except RedisError as e:
+                print(f"Token denylist unavailable: {e}")
+                claims = None # Fail closed for writes
+        return TokenSession(claims)
+
+    def save_session(self, app, session, response):
+        if isinstance(session, TokenSession):
+            return
+        return self.inner.save_session(app, session, response)
+
+def init_token_auth(app):
+    if app.config.get('TOKEN_AUTH_ENABLED'):
+        app.session_interface = TokenSessionInterface(app.session_interface)
@@ -0,0 +1,37 @@
+import hashlib # SHA-256 of each upload, computed as it streams in
+from tempfile import SpooledTemporaryFile
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+# Largest file part accepted for a declared content type, unknown types get the image cap
+def part_size_limit(content_type):
+    if content_type and content_type.startswith('video/'):
+        return current_app.config['MAX_VIDEO_UPLOAD_SIZE']
+    return current_app.config['MAX_IMAGE_UPLOAD_SIZE']
+
+# Multipart file part that stays in memory up to the spool threshold and spills to a temp file
+# beyond it, hashing and counting bytes as Werkzeug writes them. Going over the part's cap
+# aborts the request while the rest of the body is still unread.
+class HashingUploadFile(SpooledTemporaryFile):
+    def __init__(self, limit, spool_threshold):
+        super().__init__(max_size=spool_threshold, mode='w+b')
+        self.limit = limit
+        self.length = 0
+        self._sha256 = hashlib.sha256()
+
+    def write(self, data):
+        self.length += len(data)
+        if self.length > self.limit:
+            raise RequestEntityTooLarge(f"Uploads of this type are limited to {self.limit} bytes")
+        self._sha256.update(data)
+        return super().write(data)
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+# Request class whose file parts are HashingUploadFile streams, so request.files['x'].stream
+# carries .sha256 and .length once the form is parsed
+class StreamingUploadRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return HashingUploadFile(part_size_limit(content_type), current_app.config['UPLOAD_SPOOL_THRESHOLD'])
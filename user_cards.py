@@ -0,0 +1,51 @@
+import threading # The cache is shared by every request thread in the worker
+from cachetools import TTLCache
+from flask import current_app
+from database import db # Import the database instance
+from models import User
+
+UNKNOWN_CARD = {'username': None, 'profile_picture': None}
+
+_cards = None
+_lock = threading.Lock()
+
+def _cache():
+    global _cards
+    if _cards is None:
+        _cards = TTLCache(
+            maxsize=current_app.config.get('USER_CARD_CACHE_SIZE', 50000),
+            ttl=current_app.config.get('USER_CARD_TTL', 60)
+        )
+    return _cards
+
+# Author cards (username, profile_picture) for a page of ids: cache hits plus one narrow query for the misses
+def get_user_cards(user_ids):
+    user_ids = set(user_ids)
+    cards = {}
+    with _lock:
+        cache = _cache()
+        for user_id in user_ids:
+            card = cache.get(user_id)
+            if card is not None:
+                cards[user_id] = card
+
+    missing = user_ids - cards.keys()
+    if missing:
+        rows = db.session.query(User.id, User.username, User.profile_picture).filter(User.id.in_(missing)).all()
+        with _lock:
+            for row in rows:
+                card = {'username': row.username, 'profile_picture': row.profile_picture}
+                cache[row.id] = card
+                cards[row.id] = card
+
+    for user_id in missing - cards.keys():
+        cards[user_id] = UNKNOWN_CARD
+    return cards
+
+def get_user_card(user_id):
+    return get_user_cards([user_id])[user_id]
+
+# Called after a profile change, other workers catch up within USER_CARD_TTL
+def invalidate_user_card(user_id):
+    with _lock:
+        _cache().pop(user_id, None)